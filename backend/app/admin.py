@@ -0,0 +1,122 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app import listing
+from app.admission import admission
+from app.backup import get_backup_manager
+from app.coalescing import single_flight
+from app.database import get_db
+from app.diagnostics import (
+    is_admin_token,
+    profile_store,
+    slow_query_log,
+    statement_cache_stats,
+)
+from app.maintenance import get_maintenance_scheduler
+from app.sharding import ShardRouter, get_shards
+from app.snapshot import get_snapshot
+from app.timeouts import query_stats
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    # Fails closed: without a configured ADMIN_TOKEN no token matches.
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/admission")
+def admission_stats():
+    return admission.stats()
+
+
+@router.get("/coalescing")
+def coalescing_stats():
+    return single_flight.stats()
+
+
+@router.get("/snapshot")
+def snapshot_info():
+    snapshot = get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Not serving from a snapshot")
+    return snapshot.info()
+
+
+@router.get("/timeouts")
+def timeout_stats():
+    return query_stats.stats()
+
+
+@router.get("/profiles")
+def list_profiles():
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: int):
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.folded()
+
+
+@router.get("/slow-queries")
+def list_slow_queries():
+    return slow_query_log.entries()
+
+
+@router.get("/statement-cache")
+def statement_cache():
+    return statement_cache_stats.stats()
+
+
+@router.get("/backups")
+def backup_status():
+    return get_backup_manager().status()
+
+
+@router.post("/backups", status_code=202)
+def start_backup():
+    manager = get_backup_manager()
+    if not manager.start():
+        raise HTTPException(status_code=409, detail="A backup is already running")
+    return manager.status()
+
+
+@router.get("/maintenance")
+def maintenance_status():
+    return get_maintenance_scheduler().status()
+
+
+@router.post("/maintenance")
+def run_maintenance():
+    results = get_maintenance_scheduler().run()
+    if results is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running")
+    return results
+
+
+@router.get("/listing")
+def check_listing(
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        return shards.check_listing()
+    return [listing.check(db)]
+
+
+@router.post("/listing")
+def rebuild_listing(
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        return {"rows": shards.rebuild_listing()}
+    return {"rows": [listing.rebuild(db)]}
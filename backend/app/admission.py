@@ -0,0 +1,185 @@
+import asyncio
+from collections import deque
+from typing import Dict, Optional
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+EXEMPT_PATHS = ("/health", "/admin", "/docs", "/openapi.json")
+
+
+class AdmissionPool:
+    """Concurrency limit with a bounded FIFO wait queue.
+
+    Slots are handed directly to the oldest waiter on release, so a request
+    that has been queued cannot be overtaken by one that just arrived.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_queue = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.peak_queue = max(self.peak_queue, len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.timed_out += 1
+            return False
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled.
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queue": self.peak_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        read_limit: int,
+        read_queue: int,
+        write_limit: int,
+        write_queue: int,
+        queue_timeout: float,
+        route_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.read = AdmissionPool("read", read_limit, read_queue, queue_timeout)
+        self.write = AdmissionPool("write", write_limit, write_queue, queue_timeout)
+        self.routes: Dict[str, AdmissionPool] = {}
+        for key, limit in (route_limits or {}).items():
+            method = key.split(" ", 1)[0].upper()
+            queue = read_queue if method in READ_METHODS else write_queue
+            self.routes[key] = AdmissionPool(key, limit, queue, queue_timeout)
+
+    def pool_for(self, method: str, route_key: Optional[str]) -> AdmissionPool:
+        if route_key and route_key in self.routes:
+            return self.routes[route_key]
+        return self.read if method in READ_METHODS else self.write
+
+    def stats(self) -> dict:
+        return {
+            "read": self.read.stats(),
+            "write": self.write.stats(),
+            "routes": {key: pool.stats() for key, pool in self.routes.items()},
+        }
+
+
+def _route_key(scope: Scope) -> Optional[str]:
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    if router is None:
+        return None
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return None
+
+
+class AdmissionMiddleware:
+    """Sheds load with 503 + Retry-After once a pool and its queue are full."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, retry_after: int = 1):
+        self.app = app
+        self.controller = controller
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route_key = _route_key(scope) if self.controller.routes else None
+        pool = self.controller.pool_for(method, route_key)
+
+        if not await pool.acquire():
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release()
+
+    async def _reject(self, send: Send) -> None:
+        body = b'{"detail":"Server overloaded, retry later"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionController(
+    read_limit=settings.read_concurrency,
+    read_queue=settings.read_queue_size,
+    write_limit=settings.write_concurrency,
+    write_queue=settings.write_queue_size,
+    queue_timeout=settings.admission_queue_timeout,
+    route_limits=settings.route_concurrency,
+)
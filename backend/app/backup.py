@@ -0,0 +1,204 @@
+"""Online backups of the SQLite catalog.
+
+Backups use SQLite's online backup API, copying ``backup_pages_per_step``
+pages at a time and sleeping between steps. Writers are only blocked for
+one step at a time, never for the whole copy. Each copy is checked with
+``PRAGMA integrity_check``, gzip-compressed into ``backup_dir`` and pruned
+to the newest ``backup_retention`` files per database.
+
+    python -m app.backup          # run a backup now, printing progress
+    python -m app.backup list     # list stored backups
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+
+def sqlite_path(database_url: str) -> str:
+    url = make_url(database_url)
+    if not url.drivername.startswith("sqlite") or not url.database or url.database == ":memory:":
+        raise ValueError(f"Cannot back up {database_url}: not a SQLite file")
+    return url.database
+
+
+class BackupManager:
+    def __init__(
+        self,
+        database_paths: List[str],
+        backup_dir: str,
+        pages_per_step: int = 256,
+        step_sleep: float = 0.005,
+        retention: int = 7,
+    ):
+        self.database_paths = database_paths
+        self.backup_dir = Path(backup_dir)
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.retention = retention
+        self.progress: dict = {"state": "idle"}
+        self.history: deque = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, on_progress=None) -> Optional[List[dict]]:
+        """Back up every database; returns None if a backup is already running."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            results = [self._backup(path, on_progress) for path in self.database_paths]
+            self.progress = {"state": "idle"}
+            return results
+        except Exception as e:
+            self.progress = {"state": "failed", "error": str(e)}
+            raise
+        finally:
+            self._lock.release()
+
+    def start(self) -> bool:
+        """Run a backup on a background thread; False if one is already running."""
+        if self.running:
+            return False
+        threading.Thread(target=self.run, name="backup", daemon=True).start()
+        return True
+
+    def _backup(self, database_path: str, on_progress=None) -> dict:
+        stem = Path(database_path).stem
+        now = time.time()
+        timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+        timestamp += f"{int(now * 1e6) % 1_000_000:06d}"
+        copy_path = self.backup_dir / f".{stem}-{timestamp}.db.partial"
+        archive_path = self.backup_dir / f"{stem}-{timestamp}.db.gz"
+        started = time.perf_counter()
+        self.progress = {
+            "state": "copying",
+            "database": database_path,
+            "pages_total": 0,
+            "pages_done": 0,
+        }
+
+        def progress(status, remaining, total):
+            self.progress.update(pages_total=total, pages_done=total - remaining)
+            if on_progress:
+                on_progress(self.progress)
+
+        try:
+            source = sqlite3.connect(database_path)
+            target = sqlite3.connect(copy_path)
+            try:
+                page_size = source.execute("PRAGMA page_size").fetchone()[0]
+                source.backup(
+                    target, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep
+                )
+                self.progress["state"] = "verifying"
+                integrity = target.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                target.close()
+                source.close()
+
+            if integrity != "ok":
+                raise RuntimeError(f"Backup of {database_path} failed integrity check: {integrity}")
+            self.progress["state"] = "compressing"
+            with open(copy_path, "rb") as raw, gzip.open(archive_path, "wb", compresslevel=6) as gz:
+                shutil.copyfileobj(raw, gz, length=1024 * 1024)
+        finally:
+            copy_path.unlink(missing_ok=True)
+
+        duration = time.perf_counter() - started
+        size = self.progress["pages_total"] * page_size
+        result = {
+            "database": database_path,
+            "file": archive_path.name,
+            "started_at": now,
+            "duration_s": round(duration, 3),
+            "pages": self.progress["pages_total"],
+            "bytes": size,
+            "compressed_bytes": archive_path.stat().st_size,
+            "throughput_mb_s": round(size / duration / 1e6, 3) if duration else None,
+            "integrity": integrity,
+        }
+        self.history.appendleft(result)
+        self._prune(stem)
+        return result
+
+    def _prune(self, stem: str) -> None:
+        backups = sorted(self.backup_dir.glob(f"{stem}-*.db.gz"), reverse=True)
+        for old in backups[self.retention :]:
+            old.unlink()
+
+    def backups(self) -> List[dict]:
+        if not self.backup_dir.exists():
+            return []
+        return [
+            {"file": path.name, "bytes": path.stat().st_size}
+            for path in sorted(self.backup_dir.glob("*.db.gz"), reverse=True)
+        ]
+
+    def status(self) -> dict:
+        return {"progress": self.progress, "history": list(self.history), "backups": self.backups()}
+
+    def schedule(self, interval_hours: float) -> None:
+        def loop():
+            while not self._stop.wait(interval_hours * 3600):
+                try:
+                    self.run()
+                except Exception as e:
+                    print(f"Scheduled backup failed: {e}")
+
+        threading.Thread(target=loop, name="backup-scheduler", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_manager: Optional[BackupManager] = None
+
+
+def get_backup_manager() -> BackupManager:
+    global _manager
+    if _manager is None:
+        urls = [settings.database_url, *settings.shard_urls]
+        _manager = BackupManager(
+            [sqlite_path(url) for url in urls],
+            settings.backup_dir,
+            pages_per_step=settings.backup_pages_per_step,
+            step_sleep=settings.backup_step_sleep,
+            retention=settings.backup_retention,
+        )
+    return _manager
+
+
+if __name__ == "__main__":
+    manager = get_backup_manager()
+    if sys.argv[1:] == ["list"]:
+        for backup in manager.backups():
+            print(f"{backup['file']}  {backup['bytes']:,} bytes")
+        sys.exit(0)
+
+    def report(progress):
+        total = progress["pages_total"] or 1
+        print(f"\r{progress['database']}: {progress['pages_done']}/{total} pages", end="")
+
+    for result in manager.run(on_progress=report):
+        print(
+            f"\n{result['file']}: {result['bytes']:,} bytes in {result['duration_s']}s "
+            f"({result['throughput_mb_s']} MB/s), {result['compressed_bytes']:,} compressed, "
+            f"integrity {result['integrity']}"
+        )
+    print(f"Backups are in {os.path.abspath(manager.backup_dir)}")
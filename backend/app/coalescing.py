@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.admission import EXEMPT_PATHS
+from app.diagnostics import PROFILE_HEADER
+from app.timeouts import current_budget
+
+FlightKey = Tuple[str, str, bytes]
+
+
+def _flight_key(scope: Scope) -> FlightKey:
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    # Conditional requests can get a 304 instead of the body, so they only
+    # share a flight with requests carrying the same validator.
+    if_none_match = dict(scope.get("headers", [])).get(b"if-none-match", b"")
+    return scope["path"], urlencode(sorted(query)), if_none_match
+
+
+def _wants_profile(scope: Scope) -> bool:
+    return any(name == PROFILE_HEADER.encode() for name, _ in scope.get("headers", []))
+
+
+async def _replay(messages: List[Message], send: Send, follower: bool = False) -> None:
+    # Outer middleware (CORS) edits header lists in place, so every receiver
+    # gets its own copy. A profile belongs to the leader's request only.
+    for message in messages:
+        message = dict(message)
+        if "headers" in message:
+            message["headers"] = [
+                (name, value)
+                for name, value in message["headers"]
+                if not (follower and name == b"x-profile-id")
+            ]
+        await send(message)
+
+
+class SingleFlight:
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self.flights: Dict[FlightKey, asyncio.Future] = {}
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self.flights),
+            "executions": self.leaders,
+            "coalesced": self.followers,
+            "coalescing_ratio": self.followers / total if total else 0.0,
+        }
+
+
+class SingleFlightMiddleware:
+    """Coalesces identical concurrent GET requests into one execution.
+
+    The first request for a normalized path + query runs the app; requests
+    for the same key that arrive while it is in flight wait for it and are
+    sent the same status, headers and body bytes. Only GETs are coalesced,
+    and never requests asking for a profile (``X-Profile``).
+    """
+
+    def __init__(self, app: ASGIApp, single_flight: SingleFlight):
+        self.app = app
+        self.single_flight = single_flight
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or scope["path"].startswith(EXEMPT_PATHS)
+            # Profiled requests must run their own endpoint to be sampled.
+            or _wants_profile(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        state = self.single_flight
+        key = _flight_key(scope)
+        flight = state.flights.get(key)
+        if flight is not None:
+            try:
+                messages = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The leader went away before finishing; run on our own.
+                await self.app(scope, receive, send)
+                return
+            state.followers += 1
+            await _replay(messages, send, follower=True)
+            return
+
+        flight = asyncio.get_running_loop().create_future()
+        state.flights[key] = flight
+        state.leaders += 1
+        messages: List[Message] = []
+
+        async def capture(message: Message) -> None:
+            messages.append(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as exc:
+            flight.set_exception(exc)
+            # Mark as retrieved so a flight without followers does not warn.
+            flight.exception()
+            raise
+        else:
+            budget = current_budget.get()
+            if budget is not None and budget.cancelled:
+                # The leader's client went away and its queries were
+                # interrupted; followers run on their own instead.
+                flight.cancel()
+            else:
+                flight.set_result(messages)
+        finally:
+            del state.flights[key]
+
+        await _replay(messages, send)
+
+
+single_flight = SingleFlight()
@@ -8,5 +8,56 @@ class Settings(BaseSettings):
     debug: bool = True
     port: int = 8000
 
+    # Admission control: reads and writes get separate concurrency budgets and
+    # bounded wait queues. Entries in route_concurrency ("GET /books") give a
+    # route its own pool instead of the shared read/write one.
+    admission_enabled: bool = True
+    read_concurrency: int = 32
+    read_queue_size: int = 64
+    write_concurrency: int = 4
+    write_queue_size: int = 16
+    admission_queue_timeout: float = 5.0
+    admission_retry_after: int = 1
+    route_concurrency: dict[str, int] = {}
+
+    coalescing_enabled: bool = True
+
+    # Per-statement time budgets, enforced with SQLite's progress handler;
+    # route_statement_timeout_ms ("GET /books": 500) overrides the default
+    # per route and 0 disables. Larger list limits are clamped to max_page_size.
+    statement_timeout_ms: float = 5000
+    route_statement_timeout_ms: dict[str, float] = {}
+    max_page_size: int = 1000
+
+    # Serve reads from a compiled catalog snapshot and disable writes.
+    snapshot_path: str | None = None
+
+    # Extra SQLite databases to shard books across; DATABASE_URL is shard 0.
+    # shard_key is "id" or "publisher_id".
+    shard_urls: list[str] = []
+    shard_key: str = "id"
+
+    # Online backups; backup_interval_hours = 0 disables the schedule.
+    backup_dir: str = "./backups"
+    backup_interval_hours: float = 0
+    backup_retention: int = 7
+    backup_pages_per_step: int = 256
+    backup_step_sleep: float = 0.005
+
+    # Background ANALYZE / incremental vacuum / WAL checkpoint; 0 disables.
+    maintenance_interval_minutes: float = 60
+    maintenance_budget_ms: float = 200
+    maintenance_vacuum_step_pages: int = 64
+    maintenance_max_in_flight: int = 0
+
+    # Required in X-Admin-Token for /admin endpoints and in X-Profile to
+    # profile a request. When unset, /admin returns 403 and X-Profile is ignored.
+    admin_token: str | None = None
+    profile_sample_rate: float = 0.0
+    profile_interval: float = 0.005
+    profile_store_size: int = 20
+    slow_query_threshold_ms: float = 100.0
+    slow_query_log_size: int = 100
+
 
 settings = Settings()
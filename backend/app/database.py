@@ -2,8 +2,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import settings
+from app import timeouts
+from app.diagnostics import slow_query_log, statement_cache_stats
 
 engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+slow_query_log.attach(engine)
+statement_cache_stats.attach(engine)
+timeouts.attach(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,261 @@
+"""Production diagnostics: per-request sampling profiles and a slow-query log.
+
+Profiles are taken by a background thread that samples the stacks of the
+threads running the request's endpoint every ``profile_interval`` seconds.
+They are stored in collapsed-stack format ("frame;frame;frame count" per
+line), which flamegraph.pl and speedscope read directly.
+"""
+
+import functools
+import hmac
+import inspect
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, default
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+PROFILE_HEADER = "x-profile"
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.admin_token.encode())
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, interval: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.threads: set = set()
+        self._done = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._done.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self) -> None:
+        threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True).start()
+
+    def stop(self) -> None:
+        self._done.set()
+        self.duration_ms = (time.time() - self.started_at) * 1000
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+current_profile: ContextVar[Optional[Profile]] = ContextVar("current_profile", default=None)
+
+
+class ProfileStore:
+    def __init__(self, size: int):
+        self.size = size
+        self._profiles: "OrderedDict[int, Profile]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new(self, method: str, path: str, interval: float) -> Profile:
+        return Profile(next(self._ids), method, path, interval)
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles.values())]
+
+
+def profiled(endpoint: Callable) -> Callable:
+    """Let the profiler of the current request sample the thread running ``endpoint``."""
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.threads.discard(thread_id)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        # Async endpoints run on the event loop, not in a worker thread.
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfilingMiddleware:
+    """Profiles requests carrying the admin token in ``X-Profile``, plus a random sample."""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, sample_rate: float, interval: float):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return is_admin_token(value.decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.store.new(scope["method"], scope["path"], self.interval)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", str(profile.id).encode())
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            self.store.add(profile)
+
+
+class SlowQueryLog:
+    """Records statements slower than ``threshold_ms`` with their plans."""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold_ms = threshold_ms
+        self._entries: deque = deque(maxlen=size)
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        self._entries.append(
+            {
+                "recorded_at": time.time(),
+                "duration_ms": round(elapsed_ms, 3),
+                "statement": statement,
+                "parameters": repr(parameters),
+                "plan": None if executemany else self._explain(conn, cursor, statement, parameters),
+            }
+        )
+
+    @staticmethod
+    def _explain(conn, cursor, statement, parameters) -> Optional[list]:
+        if conn.dialect.name != "sqlite":
+            return None
+        # A fresh DB-API cursor: the original one still holds the results,
+        # and going through the engine would re-enter these listeners.
+        explain = cursor.connection.cursor()
+        try:
+            explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in explain.fetchall()]
+        except Exception as exc:
+            return [f"EXPLAIN failed: {exc}"]
+        finally:
+            explain.close()
+
+    def entries(self) -> list:
+        return list(reversed(self._entries))
+
+
+class StatementCacheStats:
+    """Counts how often executed statements found their compiled SQL cached."""
+
+    def __init__(self):
+        self.outcomes: Counter = Counter()
+        self._engines: list = []
+
+    def attach(self, engine: Engine) -> None:
+        self._engines.append(engine)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        if context.cache_hit is default.CACHE_HIT:
+            self.outcomes["hits"] += 1
+        elif context.cache_hit is default.CACHE_MISS:
+            self.outcomes["misses"] += 1
+        else:
+            self.outcomes["uncached"] += 1
+
+    def stats(self) -> dict:
+        hits, misses = self.outcomes["hits"], self.outcomes["misses"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncached": self.outcomes["uncached"],
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "cached_statements": sum(
+                len(engine._compiled_cache or ()) for engine in self._engines
+            ),
+        }
+
+
+profile_store = ProfileStore(settings.profile_store_size)
+slow_query_log = SlowQueryLog(settings.slow_query_threshold_ms, settings.slow_query_log_size)
+statement_cache_stats = StatementCacheStats()
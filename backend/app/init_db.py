@@ -1,21 +1,58 @@
 from datetime import date
 
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app import listing
 from app.database import Base, SessionLocal, engine
+from app.maintenance import enable_incremental_vacuum
 from app.models import Author, Book, Genre, Publisher
+from app.sync import backfill_hashes
 import sys  # TODO: remove if not needed
 
 
+def create_schema(bind: Engine) -> None:
+    """Create missing tables, and the columns and indexes that create_all
+    does not add to tables that already exist."""
+    enable_incremental_vacuum(bind)
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        with bind.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+        for index in table.indexes:
+            try:
+                with bind.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError as e:
+                # A unique index over rows that already contain duplicates.
+                print(f"Could not create index {index.name}: {e.orig}")
+    with Session(bind) as db:
+        hashed = backfill_hashes(db)
+    if hashed:
+        print(f"Hashed {hashed} rows for catalog sync")
+
+
 def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     print("Database tables created")
+    with SessionLocal() as db:
+        if listing.ensure(db):
+            print("Book listing rebuilt")
 
 
-def seed_db() -> None:
+def seed_db() -> bool:
     db = SessionLocal()
     try:
         if db.query(Genre).count() > 0:
             print("Database already seeded")
-            return
+            return False
 
         genres = [
             Genre(
@@ -129,8 +166,11 @@ def seed_db() -> None:
         ]
         db.add_all(books)
         db.commit()
+        backfill_hashes(db)
+        listing.rebuild(db)
 
         print("Database seeding completed successfully!")
+        return True
 
 
     except Exception as e:
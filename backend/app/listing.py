@@ -0,0 +1,128 @@
+"""The ``book_listing`` read model.
+
+Book listings are read far more often than books are written, so instead of
+joining books, genres, publishers and authors on every ``/books`` request,
+each book's listing row is written once with everything flattened in. The
+write paths in ``services.py`` call :func:`refresh` inside their own
+transaction, so a listing row commits or rolls back with the change to its
+book.
+
+Changes made outside ``services.py`` (seeding, shard rebalancing, edits in a
+SQL shell) can leave the table behind; :func:`check` reports differences and
+:func:`rebuild` recreates it from the source tables.
+
+    python -m app.listing check
+    python -m app.listing rebuild
+"""
+
+import sys
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import Author, Book, BookListing, Genre, Publisher, book_authors
+
+listing = BookListing.__table__
+
+_author_names = (
+    select(func.group_concat(Author.name + " " + Author.surname, ", "))
+    .select_from(book_authors.join(Author))
+    .where(book_authors.c.book_id == Book.id)
+    .scalar_subquery()
+)
+
+# What each listing row should contain, computed from the source tables.
+_SOURCE = (
+    select(
+        Book.id,
+        Book.title,
+        Book.edition,
+        Book.published_date,
+        Book.publisher_id,
+        Book.genre_id,
+        Genre.name.label("genre_name"),
+        Genre.description.label("genre_description"),
+        Publisher.name.label("publisher_name"),
+        Publisher.website.label("publisher_website"),
+        Publisher.description.label("publisher_description"),
+        Publisher.creation_date.label("publisher_creation_date"),
+        _author_names.label("author_names"),
+    )
+    .join(Genre, Book.genre_id == Genre.id)
+    .join(Publisher, Book.publisher_id == Publisher.id)
+)
+_COLUMNS = list(_SOURCE.selected_columns.keys())
+_LISTED = select(*(listing.c[name] for name in _COLUMNS))
+
+
+def refresh(db: Session, book_ids: Iterable[int]) -> None:
+    """Rewrite the listing rows of these books from the flushed session state.
+
+    Rows of books that no longer exist are removed. Does not commit.
+    """
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    db.flush()
+    db.execute(delete(listing).where(listing.c.id.in_(book_ids)))
+    db.execute(insert(listing).from_select(_COLUMNS, _SOURCE.where(Book.id.in_(book_ids))))
+
+
+def rebuild(db: Session) -> int:
+    db.execute(delete(listing))
+    db.execute(insert(listing).from_select(_COLUMNS, _SOURCE))
+    db.commit()
+    return db.execute(select(func.count()).select_from(listing)).scalar()
+
+
+def check(db: Session) -> dict:
+    """Compare the listing with what the source tables say it should hold."""
+    source_ids = set(db.scalars(select(Book.id)))
+    listed_ids = set(db.scalars(select(listing.c.id)))
+    differing = set(db.scalars(select(_SOURCE.except_(_LISTED).subquery().c.id)))
+    differing |= set(db.scalars(select(_LISTED.except_(_SOURCE).subquery().c.id)))
+    missing = source_ids - listed_ids
+    orphaned = listed_ids - source_ids
+    stale = differing - missing - orphaned
+    return {
+        "books": len(source_ids),
+        "listing_rows": len(listed_ids),
+        "consistent": not (missing or orphaned or stale),
+        "missing": sorted(missing),
+        "orphaned": sorted(orphaned),
+        "stale": sorted(stale),
+    }
+
+
+def ensure(db: Session) -> bool:
+    """Rebuild the listing if its row count does not match the books table.
+
+    A cheap startup check that catches databases created before the listing
+    existed or seeded around services.py. Returns True if it rebuilt.
+    """
+    books = db.execute(select(func.count(Book.id))).scalar()
+    listed = db.execute(select(func.count()).select_from(listing)).scalar()
+    if books == listed:
+        return False
+    rebuild(db)
+    return True
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    from app.sharding import shard_router
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ("check", "rebuild"):
+        print("Usage: python -m app.listing {check|rebuild}")
+        sys.exit(1)
+    if shard_router is not None:
+        if sys.argv[1] == "check":
+            results = shard_router.check_listing()
+        else:
+            results = shard_router.rebuild_listing()
+    else:
+        with SessionLocal() as db:
+            results = [check(db) if sys.argv[1] == "check" else rebuild(db)]
+    for shard, result in enumerate(results):
+        print(f"{shard}: {result}")
@@ -1,12 +1,61 @@
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import OperationalError
 
+from app import admin
+from app.admission import AdmissionMiddleware, admission
+from app.backup import get_backup_manager
+from app.coalescing import SingleFlightMiddleware, single_flight
 from app.config import settings
+from app.database import SessionLocal
+from app.diagnostics import ProfilingMiddleware, profile_store
 from app.routes import router
 from app.init_db import init_db, seed_db
+from app.maintenance import InFlightMiddleware, get_maintenance_scheduler
+from app.related import related_index
+from app.sharding import shard_router
+from app.snapshot import load_snapshot
+from app.timeouts import QueryBudgetMiddleware, interrupted_handler
 
 app = FastAPI(title="Book Catalog API", debug=settings.debug)
 
+# Middleware added first runs innermost. Profiling sits inside admission
+# control so only admitted requests are profiled.
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    sample_rate=settings.profile_sample_rate,
+    interval=settings.profile_interval,
+)
+
+# Added before CORS so that shed responses still carry CORS headers.
+if settings.admission_enabled:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        retry_after=settings.admission_retry_after,
+    )
+
+# Outside admission control, so requests waiting on a shared flight do not
+# hold a slot of their own.
+if settings.coalescing_enabled:
+    app.add_middleware(SingleFlightMiddleware, single_flight=single_flight)
+
+# Outside coalescing, so a leader whose client disconnected can be told apart
+# from one that finished.
+app.add_middleware(
+    QueryBudgetMiddleware,
+    timeout_ms=settings.statement_timeout_ms,
+    route_timeouts_ms=settings.route_statement_timeout_ms,
+)
+app.add_exception_handler(OperationalError, interrupted_handler)
+
+# Counts live requests for the maintenance scheduler's idle check, with or
+# without admission control.
+app.add_middleware(InFlightMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -16,15 +65,47 @@ app.add_middleware(
 )
 
 app.include_router(router, tags=["catalog"])
+app.include_router(admin.router, tags=["admin"])
+
+
+def start_related_index_build(snapshot=None):
+    # In the background, so startup is not held up on a large catalog;
+    # requests that need the index before it is ready wait for this build.
+    def build():
+        try:
+            if snapshot is not None:
+                snapshot.build_related_index()
+            elif shard_router is not None:
+                shard_router.build_related_index()
+            else:
+                with SessionLocal() as db:
+                    related_index.ensure_built(db)
+        except Exception as e:
+            print(f"Building the related-books index failed: {e}")
+
+    threading.Thread(target=build, name="related-index", daemon=True).start()
 
 
 @app.on_event("startup")
 def on_startup():
+    if settings.snapshot_path:
+        start_related_index_build(load_snapshot(settings.snapshot_path))
+        return
     init_db()
     try:
-        seed_db()
+        seeded = seed_db()
     except Exception:
-        pass
+        seeded = False
+    if shard_router is not None:
+        shard_router.init()
+        if seeded:
+            shard_router.sync_reference()
+            shard_router.rebalance()
+    start_related_index_build()
+    if settings.backup_interval_hours > 0:
+        get_backup_manager().schedule(settings.backup_interval_hours)
+    if settings.maintenance_interval_minutes > 0:
+        get_maintenance_scheduler().start()
 
 
 @app.get("/health")
@@ -0,0 +1,209 @@
+"""Background SQLite maintenance.
+
+Every ``maintenance_interval_minutes`` the scheduler waits for a quiet
+moment (no more than ``maintenance_max_in_flight`` requests being served or
+queued, as counted by :class:`InFlightMiddleware`) and then, per database:
+
+- ``PRAGMA optimize`` with a bounded ``analysis_limit`` to refresh planner
+  statistics
+- ``PRAGMA incremental_vacuum`` in small steps to return free pages
+- ``PRAGMA wal_checkpoint(TRUNCATE)`` when the database is in WAL mode
+
+Maintenance uses its own connections with a short busy timeout and stops
+once ``maintenance_budget_ms`` is spent, so it gives way to live writers
+rather than holding the write lock.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.admission import EXEMPT_PATHS
+from app.backup import sqlite_path
+from app.config import settings
+
+CHECK_INTERVAL_SECONDS = 30
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """Switch a new, empty SQLite database to incremental auto-vacuum.
+
+    The mode can only change before the first table is created (or with a
+    full VACUUM), so existing databases are left as they are.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        if not inspect(conn).get_table_names():
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+
+
+class RequestCount:
+    def __init__(self):
+        self.count = 0
+
+
+class InFlightMiddleware:
+    """Counts requests being served, including those queued for admission.
+
+    Runs whether or not admission control is enabled, so the scheduler's
+    idle check always sees live traffic.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+        requests_in_flight.count += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            requests_in_flight.count -= 1
+
+
+def _pragma(conn: sqlite3.Connection, statement: str):
+    return conn.execute(f"PRAGMA {statement}").fetchone()
+
+
+class MaintenanceScheduler:
+    def __init__(
+        self,
+        database_paths: List[str],
+        interval_minutes: float = 60,
+        budget_ms: float = 200,
+        vacuum_step_pages: int = 64,
+        max_in_flight: int = 0,
+    ):
+        self.database_paths = database_paths
+        self.interval = interval_minutes * 60
+        self.budget = budget_ms / 1000
+        self.vacuum_step_pages = vacuum_step_pages
+        self.max_in_flight = max_in_flight
+        self.history: deque = deque(maxlen=50)
+        self.last_run: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def is_quiet(self) -> bool:
+        return requests_in_flight.count <= self.max_in_flight
+
+    def run(self) -> Optional[List[dict]]:
+        """Maintain every database; returns None if a run is already in progress."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self.last_run = time.time()
+            results = [self._maintain(path) for path in self.database_paths]
+            self.history.extendleft(results)
+            return results
+        finally:
+            self._lock.release()
+
+    def _maintain(self, database_path: str) -> dict:
+        started = time.perf_counter()
+        deadline = started + self.budget
+        result = {"database": database_path, "started_at": time.time(), "tasks": []}
+
+        def task(name: str, fn) -> None:
+            if time.perf_counter() >= deadline:
+                result["tasks"].append({"name": name, "skipped": "time budget spent"})
+                return
+            task_started = time.perf_counter()
+            entry = {"name": name}
+            try:
+                entry.update(fn())
+            except sqlite3.OperationalError as e:
+                # Usually "database is locked": a writer got there first.
+                entry["error"] = str(e)
+            entry["duration_ms"] = round((time.perf_counter() - task_started) * 1000, 3)
+            result["tasks"].append(entry)
+
+        conn = sqlite3.connect(database_path, timeout=0.05, isolation_level=None)
+        try:
+            task("optimize", lambda: self._optimize(conn))
+            task("incremental_vacuum", lambda: self._incremental_vacuum(conn, deadline))
+            task("wal_checkpoint", lambda: self._checkpoint(conn))
+        finally:
+            conn.close()
+
+        result["reclaimed_pages"] = sum(t.get("reclaimed_pages", 0) for t in result["tasks"])
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    @staticmethod
+    def _optimize(conn: sqlite3.Connection) -> dict:
+        # analysis_limit makes any ANALYZE that optimize decides to run
+        # sample each index instead of scanning it.
+        _pragma(conn, "analysis_limit = 400")
+        conn.execute("PRAGMA optimize")
+        return {}
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection, deadline: float) -> dict:
+        if _pragma(conn, "auto_vacuum")[0] != 2:
+            return {"skipped": "auto_vacuum is not INCREMENTAL"}
+        before = _pragma(conn, "freelist_count")[0]
+        remaining = before
+        while remaining and time.perf_counter() < deadline:
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_step_pages})").fetchall()
+            remaining = _pragma(conn, "freelist_count")[0]
+        return {"reclaimed_pages": before - remaining, "free_pages_left": remaining}
+
+    @staticmethod
+    def _checkpoint(conn: sqlite3.Connection) -> dict:
+        if _pragma(conn, "journal_mode")[0] != "wal":
+            return {"skipped": "not in WAL mode"}
+        busy, log_pages, checkpointed = _pragma(conn, "wal_checkpoint(TRUNCATE)")
+        return {"busy": bool(busy), "wal_pages": log_pages, "checkpointed_pages": checkpointed}
+
+    def status(self) -> dict:
+        next_due = self.last_run + self.interval if self.last_run and self.interval else None
+        return {
+            "running": self._lock.locked(),
+            "last_run": self.last_run,
+            "next_due": next_due,
+            "history": list(self.history),
+        }
+
+    def start(self) -> None:
+        self.last_run = time.time()
+
+        def loop():
+            while not self._stop.wait(CHECK_INTERVAL_SECONDS):
+                if time.time() - self.last_run < self.interval or not self.is_quiet():
+                    continue
+                try:
+                    self.run()
+                except Exception as e:
+                    print(f"Database maintenance failed: {e}")
+
+        threading.Thread(target=loop, name="maintenance", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+requests_in_flight = RequestCount()
+_scheduler: Optional[MaintenanceScheduler] = None
+
+
+def get_maintenance_scheduler() -> MaintenanceScheduler:
+    global _scheduler
+    if _scheduler is None:
+        urls = [settings.database_url, *settings.shard_urls]
+        _scheduler = MaintenanceScheduler(
+            [sqlite_path(url) for url in urls],
+            interval_minutes=settings.maintenance_interval_minutes,
+            budget_ms=settings.maintenance_budget_ms,
+            vacuum_step_pages=settings.maintenance_vacuum_step_pages,
+            max_in_flight=settings.maintenance_max_in_flight,
+        )
+    return _scheduler
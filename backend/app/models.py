@@ -1,7 +1,17 @@
 from datetime import date
 from typing import List
 
-from sqlalchemy import Column, Date, ForeignKey, Integer, String, Table, Text
+from sqlalchemy import (
+    Column,
+    Date,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -11,16 +21,21 @@ book_authors = Table(
     Base.metadata,
     Column("book_id", Integer, ForeignKey("books.id"), primary_key=True),
     Column("author_id", Integer, ForeignKey("authors.id"), primary_key=True),
+    Index("ix_book_authors_author_id", "author_id"),
 )
 
 
 class Author(Base):
     __tablename__ = "authors"
+    __table_args__ = (
+        Index("uq_authors_natural_key", "name", "surname", "birth_year", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     surname: Mapped[str] = mapped_column(String(100), nullable=False)
     birth_year: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(40), nullable=True)
 
     books: Mapped[List["Book"]] = relationship(
         "Book", secondary=book_authors, back_populates="authors"
@@ -62,9 +77,64 @@ class Book(Base):
     genre_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("genres.id"), nullable=False
     )
+    content_hash: Mapped[str | None] = mapped_column(String(40), nullable=True)
 
     publisher: Mapped["Publisher"] = relationship("Publisher", back_populates="books")
     genre: Mapped["Genre"] = relationship("Genre", back_populates="books")
     authors: Mapped[List["Author"]] = relationship(
         "Author", secondary=book_authors, back_populates="books"
     )
+
+
+# A book's natural key. Editions are often missing, and SQLite treats NULLs
+# as distinct in unique indexes, so the index is on coalesce(edition, '').
+Index(
+    "uq_books_natural_key",
+    Book.title,
+    func.coalesce(Book.edition, ""),
+    Book.publisher_id,
+    unique=True,
+)
+
+
+class BookListing(Base):
+    """Read model behind book listings: one row per book with its genre,
+    publisher and author names copied in. Maintained by app.listing."""
+
+    __tablename__ = "book_listing"
+    __table_args__ = (
+        Index("ix_book_listing_title", "title"),
+        Index("ix_book_listing_published_date", "published_date"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    edition: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    published_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    publisher_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    genre_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    genre_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    genre_description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    publisher_name: Mapped[str] = mapped_column(String(200), nullable=False)
+    publisher_website: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    publisher_description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    publisher_creation_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    author_names: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    @property
+    def genre(self) -> dict:
+        return {
+            "id": self.genre_id,
+            "name": self.genre_name,
+            "description": self.genre_description,
+        }
+
+    @property
+    def publisher(self) -> dict:
+        return {
+            "id": self.publisher_id,
+            "name": self.publisher_name,
+            "website": self.publisher_website,
+            "description": self.publisher_description,
+            "creation_date": self.publisher_creation_date,
+        }
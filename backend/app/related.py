@@ -0,0 +1,251 @@
+""""More like this" scoring for books.
+
+Every book is a row of a feature matrix: its authors (kept sparse, as an
+author -> rows index), its genre, its publisher and its publication date.
+Scoring one book against the catalog is a handful of whole-array NumPy
+operations:
+
+    score = AUTHOR_WEIGHT * shared authors
+          + GENRE_WEIGHT * same genre
+          + PUBLISHER_WEIGHT * same publisher
+          + DATE_WEIGHT * exp(-|days apart| / DATE_SCALE_DAYS)
+
+The index is built from the database once, at startup or on first use, and
+then kept current by a session listener that applies committed book
+inserts, updates and deletes, including those committed during the build.
+"""
+
+import threading
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models import Book, book_authors
+
+AUTHOR_WEIGHT = 3.0
+GENRE_WEIGHT = 2.0
+PUBLISHER_WEIGHT = 1.0
+DATE_WEIGHT = 1.0
+DATE_SCALE_DAYS = 3650.0
+
+
+def _days(published: Optional[date]) -> float:
+    return float(published.toordinal()) if published else np.nan
+
+
+class RelatedIndex:
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.built = False
+        # Changes committed during a build, keyed by book id; None otherwise.
+        self._pending: Optional[Dict[int, Optional[tuple]]] = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.genres = np.zeros(capacity, dtype=np.int64)
+        self.publishers = np.zeros(capacity, dtype=np.int64)
+        self.days = np.full(capacity, np.nan)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+        self.authors_of: Dict[int, tuple] = {}
+        self.rows_by_author: Dict[int, Set[int]] = {}
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name in ("ids", "genres", "publishers", "days", "alive"):
+            old = getattr(self, name)
+            new = np.full(capacity, np.nan) if name == "days" else np.zeros(capacity, old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def reset(self) -> None:
+        with self._build_lock, self._lock:
+            self.built = False
+            self._allocate(1024)
+
+    @staticmethod
+    def _read(*dbs: Session) -> List[tuple]:
+        books = []
+        links: Dict[int, List[int]] = {}
+        for db in dbs:
+            books += db.execute(
+                select(Book.id, Book.genre_id, Book.publisher_id, Book.published_date)
+            ).all()
+            for book_id, author_id in db.execute(
+                select(book_authors.c.book_id, book_authors.c.author_id)
+            ):
+                links.setdefault(book_id, []).append(author_id)
+        return [
+            (book_id, genre_id, publisher_id, published, links.get(book_id, ()))
+            for book_id, genre_id, publisher_id, published in books
+        ]
+
+    def build(self, *dbs: Session) -> None:
+        """Build from one session, or from one per shard of a sharded catalog."""
+        self._load(lambda: self._read(*dbs))
+
+    def ensure_built(self, *dbs: Session) -> None:
+        if not self.built:
+            self._load(lambda: self._read(*dbs), once=True)
+
+    def load(self, books: Iterable[tuple]) -> None:
+        """Replace the index with ``(id, genre_id, publisher_id, published, author_ids)`` rows."""
+        self._load(lambda: books)
+
+    def ensure_loaded(self, read: Callable[[], Iterable[tuple]]) -> None:
+        if not self.built:
+            self._load(read, once=True)
+
+    def _load(self, read: Callable[[], Iterable[tuple]], once: bool = False) -> None:
+        # One build at a time; with ``once``, callers that waited for another
+        # build use its result. Changes committed while the rows are read
+        # are buffered by apply() and replayed on top of them, since the
+        # read may or may not have seen them.
+        with self._build_lock:
+            if once and self.built:
+                return
+            with self._lock:
+                self._pending = {}
+            try:
+                books = sorted(read(), key=lambda book: book[0])
+            finally:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+            with self._lock:
+                self._allocate(max(len(books), 1024))
+                for book in books:
+                    self._upsert(*book)
+                self._apply(pending)
+                self.built = True
+
+    def upsert(
+        self,
+        book_id: int,
+        genre_id: int,
+        publisher_id: int,
+        published: Optional[date],
+        author_ids: Iterable[int],
+    ) -> None:
+        with self._lock:
+            self._upsert(book_id, genre_id, publisher_id, published, author_ids)
+
+    def _upsert(self, book_id, genre_id, publisher_id, published, author_ids) -> None:
+        row = self.row_of.get(book_id)
+        if row is None:
+            row = self.size
+            self._grow(row + 1)
+            self.size += 1
+            self.row_of[book_id] = row
+        self._unlink(row)
+
+        self.ids[row] = book_id
+        self.genres[row] = genre_id
+        self.publishers[row] = publisher_id
+        self.days[row] = _days(published)
+        self.alive[row] = True
+        self.authors_of[row] = tuple(author_ids)
+        for author_id in self.authors_of[row]:
+            self.rows_by_author.setdefault(author_id, set()).add(row)
+
+    def remove(self, book_id: int) -> None:
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id: int) -> None:
+        row = self.row_of.pop(book_id, None)
+        if row is not None:
+            self._unlink(row)
+            self.alive[row] = False
+
+    def apply(self, changes: Dict[int, Optional[tuple]]) -> None:
+        """Apply committed ``{book_id: fields or None for deleted}`` changes."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(changes)
+            elif self.built:
+                self._apply(changes)
+
+    def _apply(self, changes: Dict[int, Optional[tuple]]) -> None:
+        for book_id, fields in changes.items():
+            if fields is None:
+                self._remove(book_id)
+            else:
+                self._upsert(book_id, *fields)
+
+    def _unlink(self, row: int) -> None:
+        for author_id in self.authors_of.pop(row, ()):
+            rows = self.rows_by_author.get(author_id)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.rows_by_author[author_id]
+
+    def related(self, book_id: int, limit: int = 10) -> Optional[List[int]]:
+        """Ids of the ``limit`` books most similar to ``book_id``, best first."""
+        with self._lock:
+            row = self.row_of.get(book_id)
+            if row is None:
+                return None
+            n = self.size
+
+            scores = GENRE_WEIGHT * (self.genres[:n] == self.genres[row])
+            scores += PUBLISHER_WEIGHT * (self.publishers[:n] == self.publishers[row])
+
+            co_authored = [r for a in self.authors_of[row] for r in self.rows_by_author[a]]
+            if co_authored:
+                scores += AUTHOR_WEIGHT * np.bincount(co_authored, minlength=n)
+
+            if not np.isnan(self.days[row]):
+                proximity = np.exp(-np.abs(self.days[:n] - self.days[row]) / DATE_SCALE_DAYS)
+                scores += DATE_WEIGHT * np.nan_to_num(proximity)
+
+            scores[~self.alive[:n]] = -np.inf
+            scores[row] = -np.inf
+
+            candidates = int(np.count_nonzero(np.isfinite(scores)))
+            limit = min(max(limit, 0), candidates)
+            if limit == 0:
+                return []
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return self.ids[top].tolist()
+
+
+related_index = RelatedIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_book_changes(session, flush_context):
+    changes = session.info.setdefault("related_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Book):
+            changes[obj.id] = (
+                obj.genre_id,
+                obj.publisher_id,
+                obj.published_date,
+                [author.id for author in obj.authors],
+            )
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_book_changes(session):
+    changes = session.info.pop("related_changes", None)
+    if changes:
+        related_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_book_changes(session):
+    session.info.pop("related_changes", None)
@@ -1,26 +1,71 @@
+import hashlib
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app import services
+from app import services, sync, timeouts
 from app.database import get_db
+from app.config import settings
+from app.diagnostics import ProfiledRoute
 from app.schemas import (
     AuthorCreate,
     AuthorDetail,
     AuthorSummary,
     AuthorUpdate,
     BookCreate,
+    Bootstrap,
     BookDetail,
     BookSummary,
     BookUpdate,
+    CatalogSync,
     GenreDetail,
     GenreSummary,
     PublisherDetail,
     PublisherSummary,
 )
+from app.sharding import ShardRouter, get_shards
+from app.snapshot import Snapshot, get_snapshot, require_writable
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _page_size(limit: int) -> int:
+    # SQLite reads a negative LIMIT as "no limit", so those get the cap too.
+    if limit < 0:
+        return settings.max_page_size
+    return min(limit, settings.max_page_size)
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@router.get("/bootstrap", response_model=Bootstrap)
+def bootstrap(
+    request: Request,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    """Everything the frontend needs for first paint in one response."""
+    limit = _page_size(limit)
+    if snapshot is not None:
+        data = snapshot.get_bootstrap(limit=limit)
+    elif shards is not None:
+        data = shards.get_bootstrap(limit=limit)
+    else:
+        data = services.get_bootstrap(db, limit=limit)
+
+    body = Bootstrap.model_validate(data, from_attributes=True).model_dump_json()
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    if _etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("/authors", response_model=List[AuthorSummary])
@@ -30,39 +75,92 @@ def list_authors(
     sort_by: Optional[str] = None,
     order: str = "asc",
     db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
 ):
+    limit = _page_size(limit)
+    if snapshot is not None:
+        return snapshot.get_authors(skip=skip, limit=limit, sort_by=sort_by, order=order)
     return services.get_authors(
         db, skip=skip, limit=limit, sort_by=sort_by, order=order
     )
 
 
-@router.post("/authors", response_model=AuthorDetail, status_code=201)
-def create_author(author: AuthorCreate, db: Session = Depends(get_db)):
+@router.post(
+    "/authors",
+    response_model=AuthorDetail,
+    status_code=201,
+    dependencies=[Depends(require_writable)],
+)
+def create_author(
+    author: AuthorCreate,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
     try:
+        if shards is not None:
+            return shards.create_author(author)
         return services.create_author(db, author)
+    except HTTPException:
+        raise
     except Exception:
+        # Interrupted statements are answered by timeouts.interrupted_handler.
+        if timeouts.interrupted():
+            raise
         raise HTTPException(status_code=400, detail="Could not create author")
 
 
 @router.get("/authors/{author_id}", response_model=AuthorDetail)
-def get_author(author_id: int, db: Session = Depends(get_db)):
-    author = services.get_author(db, author_id)
+def get_author(
+    author_id: int,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if snapshot is not None:
+        author = snapshot.get_author(author_id)
+    elif shards is not None:
+        author = shards.get_author(author_id)
+    else:
+        author = services.get_author(db, author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
     return author
 
 
-@router.put("/authors/{author_id}", response_model=AuthorDetail)
-def update_author(author_id: int, author: AuthorUpdate, db: Session = Depends(get_db)):
-    updated_author = services.update_author(db, author_id, author)
+@router.put(
+    "/authors/{author_id}",
+    response_model=AuthorDetail,
+    dependencies=[Depends(require_writable)],
+)
+def update_author(
+    author_id: int,
+    author: AuthorUpdate,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        updated_author = shards.update_author(author_id, author)
+    else:
+        updated_author = services.update_author(db, author_id, author)
     if not updated_author:
         raise HTTPException(status_code=404, detail="Author not found")
     return updated_author
 
 
-@router.delete("/authors/{author_id}", status_code=204)
-def delete_author(author_id: int, db: Session = Depends(get_db)):
-    deleted = services.delete_author(db, author_id)
+@router.delete(
+    "/authors/{author_id}",
+    status_code=204,
+    dependencies=[Depends(require_writable)],
+)
+def delete_author(
+    author_id: int,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        deleted = shards.delete_author(author_id)
+    else:
+        deleted = services.delete_author(db, author_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Author not found")
 
@@ -77,9 +175,11 @@ def list_books(
     sort_by: Optional[str] = None,
     order: str = "asc",
     db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    shards: Optional[ShardRouter] = Depends(get_shards),
 ):
-    return services.get_books(
-        db,
+    limit = _page_size(limit)
+    filters = dict(
         skip=skip,
         limit=limit,
         author_id=author_id,
@@ -88,60 +188,176 @@ def list_books(
         sort_by=sort_by,
         order=order,
     )
+    if snapshot is not None:
+        return snapshot.get_books(**filters)
+    if shards is not None:
+        return shards.get_books(**filters)
+    return services.get_books(db, **filters)
 
 
-@router.post("/books", response_model=BookDetail, status_code=201)
-def create_book(book: BookCreate, db: Session = Depends(get_db)):
+@router.post(
+    "/books",
+    response_model=BookDetail,
+    status_code=201,
+    dependencies=[Depends(require_writable)],
+)
+def create_book(
+    book: BookCreate,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
     try:
+        if shards is not None:
+            return shards.create_book(book)
         return services.create_book(db, book)
+    except HTTPException:
+        raise
     except Exception:
+        # Interrupted statements are answered by timeouts.interrupted_handler.
+        if timeouts.interrupted():
+            raise
         raise HTTPException(status_code=400, detail="Could not create book")
 
 
 @router.get("/books/{book_id}", response_model=BookDetail)
-def get_book(book_id: int, db: Session = Depends(get_db)):
-    book = services.get_book(db, book_id)
+def get_book(
+    book_id: int,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if snapshot is not None:
+        book = snapshot.get_book(book_id)
+    elif shards is not None:
+        book = shards.get_book(book_id)
+    else:
+        book = services.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
 
-@router.put("/books/{book_id}", response_model=BookDetail)
-def update_book(book_id: int, book: BookUpdate, db: Session = Depends(get_db)):
-    updated_book = services.update_book(db, book_id, book)
+@router.get("/books/{book_id}/related", response_model=List[BookSummary])
+def list_related_books(
+    book_id: int,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    # Not a SQL LIMIT: a negative limit means no results, not all of them.
+    limit = max(0, min(limit, settings.max_page_size))
+    if snapshot is not None:
+        related = snapshot.get_related_books(book_id, limit=limit)
+    elif shards is not None:
+        related = shards.get_related_books(book_id, limit=limit)
+    else:
+        related = services.get_related_books(db, book_id, limit=limit)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return related
+
+
+@router.put(
+    "/books/{book_id}",
+    response_model=BookDetail,
+    dependencies=[Depends(require_writable)],
+)
+def update_book(
+    book_id: int,
+    book: BookUpdate,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        updated_book = shards.update_book(book_id, book)
+    else:
+        updated_book = services.update_book(db, book_id, book)
     if not updated_book:
         raise HTTPException(status_code=404, detail="Book not found")
     return updated_book
 
 
-@router.delete("/books/{book_id}", status_code=204)
-def delete_book(book_id: int, db: Session = Depends(get_db)):
-    deleted = services.delete_book(db, book_id)
+@router.delete(
+    "/books/{book_id}",
+    status_code=204,
+    dependencies=[Depends(require_writable)],
+)
+def delete_book(
+    book_id: int,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        deleted = shards.delete_book(book_id)
+    else:
+        deleted = services.delete_book(db, book_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Book not found")
 
 
+@router.put("/sync", dependencies=[Depends(require_writable)])
+def sync_catalog(
+    payload: CatalogSync,
+    db: Session = Depends(get_db),
+    shards: Optional[ShardRouter] = Depends(get_shards),
+):
+    if shards is not None:
+        raise HTTPException(status_code=501, detail="Sync is not supported on a sharded catalog")
+    return sync.sync_catalog(db, payload)
+
+
 @router.get("/genres", response_model=List[GenreSummary])
-def list_genres(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def list_genres(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+):
+    limit = _page_size(limit)
+    if snapshot is not None:
+        return snapshot.get_genres(skip=skip, limit=limit)
     return services.get_genres(db, skip=skip, limit=limit)
 
 
 @router.get("/genres/{genre_id}", response_model=GenreDetail)
-def get_genre(genre_id: int, db: Session = Depends(get_db)):
-    genre = services.get_genre(db, genre_id)
+def get_genre(
+    genre_id: int,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+):
+    if snapshot is not None:
+        genre = snapshot.get_genre(genre_id)
+    else:
+        genre = services.get_genre(db, genre_id)
     if not genre:
         raise HTTPException(status_code=404, detail="Genre not found")
     return genre
 
 
 @router.get("/publishers", response_model=List[PublisherSummary])
-def list_publishers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def list_publishers(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+):
+    limit = _page_size(limit)
+    if snapshot is not None:
+        return snapshot.get_publishers(skip=skip, limit=limit)
     return services.get_publishers(db, skip=skip, limit=limit)
 
 
 @router.get("/publishers/{publisher_id}", response_model=PublisherDetail)
-def get_publisher(publisher_id: int, db: Session = Depends(get_db)):
-    publisher = services.get_publisher(db, publisher_id)
+def get_publisher(
+    publisher_id: int,
+    db: Session = Depends(get_db),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+):
+    if snapshot is not None:
+        publisher = snapshot.get_publisher(publisher_id)
+    else:
+        publisher = services.get_publisher(db, publisher_id)
     if not publisher:
         raise HTTPException(status_code=404, detail="Publisher not found")
     return publisher
@@ -101,3 +101,32 @@ class AuthorDetail(AuthorBase):
 
     id: int
     books: List[BookSummary] = []
+
+
+class Bootstrap(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    genres: List[GenreSummary]
+    publishers: List[PublisherSummary]
+    authors: List[AuthorSummary]
+    books: List[BookSummary]
+
+
+class SyncAuthor(BaseModel):
+    name: str
+    surname: str
+    birth_year: int
+
+
+class SyncBook(BaseModel):
+    title: str
+    edition: Optional[str] = None
+    published_date: Optional[date] = None
+    publisher_id: int
+    genre_id: int
+    authors: List[SyncAuthor] = []
+
+
+class CatalogSync(BaseModel):
+    authors: List[SyncAuthor] = []
+    books: List[SyncBook] = []
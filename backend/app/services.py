@@ -1,10 +1,104 @@
+from contextlib import contextmanager
 from typing import List, Optional
 
 from fastapi import HTTPException
+from sqlalchemy import func, lambda_stmt, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
-from app.models import Author, Book, Genre, Publisher
+from app import listing
+from app.models import Author, Book, BookListing, Genre, Publisher, book_authors
+from app.related import related_index
 from app.schemas import AuthorCreate, AuthorUpdate, BookCreate, BookUpdate
+from app.sync import author_hash, book_hash
+
+# Statements are built once and extended per call. Their compiled SQL is
+# cached by the engine, so a call only pays for binding parameters.
+# Fixed-shape lookups use lambda statements, which also skip rebuilding the
+# statement itself; lambdas only track plain values in their closures, so
+# anything that varies the SQL (filters, sort columns) stays a select().
+_AUTHOR_LIST = select(Author)
+_BOOK_LIST = select(BookListing)
+
+
+def _sort(stmt, model, sort_by: Optional[str], order: str):
+    order_column = model.__table__.columns.get(sort_by) if sort_by else None
+    if order_column is None:
+        return stmt
+    if order == "desc":
+        return stmt.order_by(order_column.desc())
+    return stmt.order_by(order_column)
+
+
+def _authors_by_ids(db: Session, author_ids: List[int]) -> List[Author]:
+    authors = db.scalars(
+        lambda_stmt(lambda: select(Author).where(Author.id.in_(author_ids)))
+    ).all()
+    if len(authors) != len(author_ids):
+        raise HTTPException(status_code=400, detail="One or more author IDs not found")
+    return authors
+
+
+def _check_genre_and_publisher(db: Session, genre_id: int, publisher_id: int) -> None:
+    if db.get(Genre, genre_id) is None:
+        raise HTTPException(status_code=400, detail="Genre not found")
+    if db.get(Publisher, publisher_id) is None:
+        raise HTTPException(status_code=400, detail="Publisher not found")
+
+
+@contextmanager
+def _natural_key_conflict(db: Session, detail: str):
+    try:
+        yield
+    except IntegrityError as e:
+        # Other integrity errors (NOT NULL, foreign keys) are not conflicts.
+        if "UNIQUE constraint failed" not in str(e.orig):
+            raise
+        db.rollback()
+        raise HTTPException(status_code=409, detail=detail)
+
+
+def _hash_book(db_book: Book) -> None:
+    db_book.content_hash = book_hash(
+        db_book.title,
+        db_book.edition,
+        db_book.published_date,
+        db_book.publisher_id,
+        db_book.genre_id,
+        [author.id for author in db_book.authors],
+    )
+
+
+_AUTHOR_EXISTS = "An author with this name, surname and birth year already exists"
+_BOOK_EXISTS = "A book with this title and edition already exists for this publisher"
+
+
+def check_book_natural_key(
+    db: Session,
+    title: str,
+    edition: Optional[str],
+    publisher_id: int,
+    exclude_id: Optional[int] = None,
+) -> None:
+    """Raise 409 if another book already has this title, edition and publisher."""
+    query = select(Book.id).where(
+        Book.title == title,
+        func.coalesce(Book.edition, "") == (edition or ""),
+        Book.publisher_id == publisher_id,
+    )
+    if exclude_id is not None:
+        query = query.where(Book.id != exclude_id)
+    if db.execute(query.limit(1)).first() is not None:
+        raise HTTPException(status_code=409, detail=_BOOK_EXISTS)
+
+
+def _begin_read(db: Session) -> None:
+    # pysqlite only opens a transaction before writes, so consecutive SELECTs
+    # can each see a different commit. An explicit BEGIN makes them share one
+    # read snapshot until the session ends.
+    conn = db.connection()
+    if conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN")
 
 
 def get_authors(
@@ -14,34 +108,27 @@ def get_authors(
     sort_by: Optional[str] = None,
     order: str = "asc",
 ) -> List[Author]:
-    query = db.query(Author)
-
-    if sort_by:
-        order_column = getattr(Author, sort_by, None)
-        if order_column:
-            if order == "desc":
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column)
-
-    return query.offset(skip).limit(limit).all()
+    stmt = _sort(_AUTHOR_LIST, Author, sort_by, order)
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
 
 
 def get_author(db: Session, author_id: int) -> Optional[Author]:
-    return (
-        db.query(Author)
-        .options(joinedload(Author.books).joinedload(Book.genre))
-        .options(joinedload(Author.books).joinedload(Book.publisher))
-        .filter(Author.id == author_id)
-        .first()
+    stmt = lambda_stmt(
+        lambda: select(Author).options(
+            joinedload(Author.books).joinedload(Book.genre),
+            joinedload(Author.books).joinedload(Book.publisher),
+        )
     )
+    stmt += lambda s: s.where(Author.id == author_id)
+    return db.execute(stmt).unique().scalar_one_or_none()
 
 
 def create_author(db: Session, author: AuthorCreate) -> Author:
     payload = author.model_dump()
-    db_author = Author(**payload)
+    db_author = Author(**payload, content_hash=author_hash(**payload))
     db.add(db_author)
-    db.commit()
+    with _natural_key_conflict(db, _AUTHOR_EXISTS):
+        db.commit()
     db.refresh(db_author)
     return db_author
 
@@ -49,25 +136,24 @@ def create_author(db: Session, author: AuthorCreate) -> Author:
 def update_author(
     db: Session, author_id: int, author: AuthorUpdate
 ) -> Optional[Author]:
-    db_author = db.query(Author).filter(Author.id == author_id).first()
+    db_author = db.get(Author, author_id)
     if not db_author:
         return None
 
-    for key, value in author.model_dump().items():
+    payload = author.model_dump()
+    for key, value in payload.items():
         setattr(db_author, key, value)
+    db_author.content_hash = author_hash(**payload)
 
-    db.commit()
+    with _natural_key_conflict(db, _AUTHOR_EXISTS):
+        listing.refresh(db, [book.id for book in db_author.books])
+        db.commit()
     db.refresh(db_author)
     return db_author
 
 
 def delete_author(db: Session, author_id: int) -> bool:
-    db_author = (
-        db.query(Author)
-        .options(joinedload(Author.books))
-        .filter(Author.id == author_id)
-        .first()
-    )
+    db_author = db.get(Author, author_id, options=[joinedload(Author.books)])
 
     if not db_author:
         return False
@@ -93,117 +179,136 @@ def get_books(
     publisher_id: Optional[int] = None,
     sort_by: Optional[str] = None,
     order: str = "asc",
-) -> List[Book]:
-    query = db.query(Book).options(
-        joinedload(Book.genre), joinedload(Book.publisher), joinedload(Book.authors)
-    )
+) -> List[BookListing]:
+    stmt = _BOOK_LIST
 
     if author_id:
-        query = query.join(Book.authors).filter(Author.id == author_id)
+        stmt = stmt.where(
+            BookListing.id.in_(
+                select(book_authors.c.book_id).where(book_authors.c.author_id == author_id)
+            )
+        )
     if genre_id:
-        query = query.filter(Book.genre_id == genre_id)
+        stmt = stmt.where(BookListing.genre_id == genre_id)
     if publisher_id:
-        query = query.filter(Book.publisher_id == publisher_id)
-
-    if sort_by:
-        order_column = getattr(Book, sort_by, None)
-        if order_column:
-            if order == "desc":
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column)
+        stmt = stmt.where(BookListing.publisher_id == publisher_id)
 
-    return query.offset(skip).limit(limit).all()
+    stmt = _sort(stmt, BookListing, sort_by, order)
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
 
 
 def get_book(db: Session, book_id: int) -> Optional[Book]:
-    return (
-        db.query(Book)
-        .options(
+    stmt = lambda_stmt(
+        lambda: select(Book).options(
             joinedload(Book.genre),
             joinedload(Book.publisher),
             joinedload(Book.authors),
         )
-        .filter(Book.id == book_id)
-        .first()
     )
+    stmt += lambda s: s.where(Book.id == book_id)
+    return db.execute(stmt).unique().scalar_one_or_none()
 
 
-def create_book(db: Session, book: BookCreate) -> Book:
-    author_count = db.query(Author).filter(Author.id.in_(book.author_ids)).count()
-    if author_count != len(book.author_ids):
-        raise HTTPException(status_code=400, detail="One or more author IDs not found")
+def get_related_books(db: Session, book_id: int, limit: int = 10) -> Optional[List[Book]]:
+    related_index.ensure_built(db)
+    related_ids = related_index.related(book_id, limit)
+    if related_ids is None:
+        return None
 
-    authors = db.query(Author).filter(Author.id.in_(book.author_ids)).all()
+    return get_books_by_ids(db, related_ids)
 
-    genre = db.query(Genre).filter(Genre.id == book.genre_id).first()
-    if not genre:
-        raise HTTPException(status_code=400, detail="Genre not found")
 
-    publisher = db.query(Publisher).filter(Publisher.id == book.publisher_id).first()
-    if not publisher:
-        raise HTTPException(status_code=400, detail="Publisher not found")
+def get_books_by_ids(db: Session, book_ids: List[int]) -> List[Book]:
+    books = db.scalars(
+        lambda_stmt(
+            lambda: select(Book)
+            .options(joinedload(Book.genre), joinedload(Book.publisher))
+            .where(Book.id.in_(book_ids))
+        )
+    ).all()
+    books_by_id = {book.id: book for book in books}
+    return [books_by_id[book_id] for book_id in book_ids if book_id in books_by_id]
+
+
+def create_book(db: Session, book: BookCreate, book_id: Optional[int] = None) -> Book:
+    authors = _authors_by_ids(db, book.author_ids)
+    _check_genre_and_publisher(db, book.genre_id, book.publisher_id)
 
     book_data = book.model_dump(exclude={"author_ids"})
-    db_book = Book(**book_data, authors=authors)
+    db_book = Book(**book_data, id=book_id, authors=authors)
+    _hash_book(db_book)
     db.add(db_book)
-    db.commit()
+    with _natural_key_conflict(db, _BOOK_EXISTS):
+        db.flush()
+        listing.refresh(db, [db_book.id])
+        db.commit()
     db.refresh(db_book)
     return db_book
 
 
 def update_book(db: Session, book_id: int, book: BookUpdate) -> Optional[Book]:
-    db_book = db.query(Book).filter(Book.id == book_id).first()
+    db_book = db.get(Book, book_id)
     if not db_book:
         return None
 
     if book.author_ids is not None:
-        author_count = db.query(Author).filter(Author.id.in_(book.author_ids)).count()
-        if author_count != len(book.author_ids):
-            raise HTTPException(status_code=400, detail="One or more author IDs not found")
-        authors = db.query(Author).filter(Author.id.in_(book.author_ids)).all()
+        authors = _authors_by_ids(db, book.author_ids)
     else:
         authors = db_book.authors
 
-    genre = db.query(Genre).filter(Genre.id == book.genre_id).first()
-    if not genre:
-        raise HTTPException(status_code=400, detail="Genre not found")
-
-    publisher = db.query(Publisher).filter(Publisher.id == book.publisher_id).first()
-    if not publisher:
-        raise HTTPException(status_code=400, detail="Publisher not found")
+    _check_genre_and_publisher(db, book.genre_id, book.publisher_id)
 
     book_data = book.model_dump(exclude={"author_ids"}, exclude_unset=True)
     for key, value in book_data.items():
         setattr(db_book, key, value)
     db_book.authors = authors
+    _hash_book(db_book)
 
-    db.commit()
+    with _natural_key_conflict(db, _BOOK_EXISTS):
+        listing.refresh(db, [book_id])
+        db.commit()
     db.refresh(db_book)
     return db_book
 
 
 def delete_book(db: Session, book_id: int) -> bool:
-    db_book = db.query(Book).filter(Book.id == book_id).first()
+    db_book = db.get(Book, book_id)
     if not db_book:
         return False
 
     db.delete(db_book)
+    listing.refresh(db, [book_id])
     db.commit()
     return True
 
 
 def get_genres(db: Session, skip: int = 0, limit: int = 100) -> List[Genre]:
-    return db.query(Genre).offset(skip).limit(limit).all()
+    return db.scalars(select(Genre).offset(skip).limit(limit)).all()
 
 
 def get_genre(db: Session, genre_id: int) -> Optional[Genre]:
-    return db.query(Genre).filter(Genre.id == genre_id).first()
+    return db.get(Genre, genre_id)
 
 
 def get_publishers(db: Session, skip: int = 0, limit: int = 100) -> List[Publisher]:
-    return db.query(Publisher).offset(skip).limit(limit).all()
+    return db.scalars(select(Publisher).offset(skip).limit(limit)).all()
 
 
 def get_publisher(db: Session, publisher_id: int) -> Optional[Publisher]:
-    return db.query(Publisher).filter(Publisher.id == publisher_id).first()
+    return db.get(Publisher, publisher_id)
+
+
+def get_bootstrap(db: Session, limit: int = 100, include_books: bool = True) -> dict:
+    _begin_read(db)
+    try:
+        return {
+            "genres": get_genres(db, limit=-1),
+            "publishers": get_publishers(db, limit=-1),
+            "authors": get_authors(db, limit=limit),
+            "books": get_books(db, limit=limit) if include_books else [],
+        }
+    finally:
+        # Outside WAL mode an open read transaction blocks writers, so end it
+        # now; results are detached first so the rollback does not expire them.
+        db.expunge_all()
+        db.rollback()
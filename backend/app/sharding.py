@@ -0,0 +1,443 @@
+"""Sharded catalog storage across several SQLite files.
+
+Shard 0 is the main database (``DATABASE_URL``); ``SHARD_URLS`` adds the
+others. Books and their ``book_authors`` links live on exactly one shard,
+chosen by ``SHARD_KEY``: ``id`` (book id modulo the shard count) or
+``publisher_id``. Genres, publishers and authors are reference data,
+replicated to every shard so each shard can answer book queries with its
+usual joins. Book ids come from a sequence on shard 0 so they stay unique
+across shards.
+
+Writes that touch several shards (author changes, moving a book whose
+shard key changed) are not atomic across files. They copy before they
+delete, so an interruption leaves a duplicate rather than a loss, and the
+next ``rebalance`` cleans it up.
+
+Tooling:
+
+    python -m app.sharding init            # create tables on every shard
+    python -m app.sharding sync-reference  # copy genres/publishers/authors
+    python -m app.sharding rebalance       # move books to their shard
+"""
+
+import heapq
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import listing, services, timeouts
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.diagnostics import slow_query_log, statement_cache_stats
+from app.init_db import create_schema
+from app.models import Author, Book, Genre, Publisher, book_authors
+from app.related import related_index
+from app.schemas import AuthorCreate, AuthorUpdate, BookCreate, BookUpdate
+from app.snapshot import sort_key
+
+SHARD_KEYS = ("id", "publisher_id")
+REFERENCE_MODELS = (Genre, Publisher, Author)
+
+sequence_metadata = MetaData()
+book_id_sequence = Table(
+    "book_id_sequence",
+    sequence_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("last_id", Integer, nullable=False),
+)
+
+
+class ShardRouter:
+    def __init__(self, engines: list, session_factories: list, shard_key: str = "id"):
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key {shard_key!r}, expected one of {SHARD_KEYS}")
+        self.engines = engines
+        self.session_factories = session_factories
+        self.shard_key = shard_key
+        self._pool = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="shard")
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    def shard_for(self, book_id: int, publisher_id: int) -> int:
+        value = publisher_id if self.shard_key == "publisher_id" else book_id
+        return value % self.count
+
+    @contextmanager
+    def session(self, shard: int):
+        db = self.session_factories[shard]()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _run(self, shard: int, fn: Callable[[Session], object]):
+        with self.session(shard) as db:
+            return fn(db)
+
+    def _each(self, fn: Callable[[Session], object], shards=None) -> list:
+        shards = range(self.count) if shards is None else shards
+        # Each task runs in a copy of the caller's context so shard queries
+        # stay under the request's statement budget.
+        futures = [
+            self._pool.submit(copy_context().run, self._run, shard, fn) for shard in shards
+        ]
+        return [future.result() for future in futures]
+
+    def _locate(self, book_id: int) -> Optional[int]:
+        if self.shard_key == "id":
+            return self.shard_for(book_id, 0)
+        found = self._each(lambda db: db.get(Book, book_id) is not None)
+        return found.index(True) if True in found else None
+
+    def _next_book_id(self) -> int:
+        with self.engines[0].begin() as conn:
+            return conn.execute(
+                update(book_id_sequence)
+                .values(last_id=book_id_sequence.c.last_id + 1)
+                .returning(book_id_sequence.c.last_id)
+            ).scalar_one()
+
+    # Reads
+
+    def get_books(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        author_id: Optional[int] = None,
+        genre_id: Optional[int] = None,
+        publisher_id: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        order: str = "asc",
+    ) -> List[Book]:
+        # Each shard returns its own first skip + limit rows in a common
+        # order; the global page is then cut from their merge.
+        column = sort_by if sort_by in Book.__table__.columns.keys() else "id"
+        skip = max(skip, 0)
+        window = -1 if limit < 0 else skip + limit
+
+        shards = None
+        if publisher_id and self.shard_key == "publisher_id":
+            shards = [publisher_id % self.count]
+
+        per_shard = self._each(
+            lambda db: services.get_books(
+                db,
+                skip=0,
+                limit=window,
+                author_id=author_id,
+                genre_id=genre_id,
+                publisher_id=publisher_id,
+                sort_by=column,
+                order=order,
+            ),
+            shards,
+        )
+        merged = heapq.merge(
+            *per_shard,
+            key=lambda book: sort_key(getattr(book, column)),
+            reverse=order == "desc",
+        )
+        return list(islice(merged, skip, None if limit < 0 else skip + limit))
+
+    def get_book(self, book_id: int) -> Optional[Book]:
+        shard = self._locate(book_id)
+        if shard is None:
+            return None
+        return self._run(shard, lambda db: services.get_book(db, book_id))
+
+    def get_author(self, author_id: int) -> Optional[dict]:
+        author = self._run(0, lambda db: db.get(Author, author_id))
+        if author is None:
+            return None
+        return {
+            "id": author.id,
+            "name": author.name,
+            "surname": author.surname,
+            "birth_year": author.birth_year,
+            "books": self.get_books(author_id=author_id, limit=-1),
+        }
+
+    def get_bootstrap(self, limit: int = 100) -> dict:
+        # Reference data and authors are replicated, so shard 0 serves them
+        # from one transaction; books are merged across shards as for /books.
+        data = self._run(0, lambda db: services.get_bootstrap(db, limit=limit, include_books=False))
+        data["books"] = self.get_books(limit=limit)
+        return data
+
+    def build_related_index(self) -> None:
+        if related_index.built:
+            return
+        sessions = [factory() for factory in self.session_factories]
+        try:
+            related_index.ensure_built(*sessions)
+        finally:
+            for db in sessions:
+                db.close()
+
+    def get_related_books(self, book_id: int, limit: int = 10) -> Optional[List[Book]]:
+        self.build_related_index()
+        related_ids = related_index.related(book_id, limit)
+        if related_ids is None:
+            return None
+        found = self._each(lambda db: services.get_books_by_ids(db, related_ids))
+        books_by_id = {book.id: book for books in found for book in books}
+        return [books_by_id[book_id] for book_id in related_ids if book_id in books_by_id]
+
+    # Writes
+
+    def _check_book_natural_key(self, title, edition, publisher_id, book_id=None) -> None:
+        # Under the publisher_id key all books of a publisher share a shard,
+        # whose unique index already enforces the key. Under the id key equal
+        # keys can land on different shards, so every shard is checked first;
+        # the check is not atomic with the write that follows.
+        if self.shard_key != "id":
+            return
+        self._each(
+            lambda db: services.check_book_natural_key(
+                db, title, edition, publisher_id, exclude_id=book_id
+            )
+        )
+
+    def create_book(self, book: BookCreate) -> Book:
+        self._check_book_natural_key(book.title, book.edition, book.publisher_id)
+        book_id = self._next_book_id()
+        shard = self.shard_for(book_id, book.publisher_id)
+
+        def create(db: Session) -> Book:
+            services.create_book(db, book, book_id=book_id)
+            return services.get_book(db, book_id)
+
+        return self._run(shard, create)
+
+    def update_book(self, book_id: int, book: BookUpdate) -> Optional[Book]:
+        current = self._locate(book_id)
+        if current is None:
+            return None
+        target = self.shard_for(book_id, book.publisher_id)
+
+        if self.shard_key == "id":
+            fields = book.model_dump(exclude_unset=True)
+            if "edition" not in fields:
+                fields["edition"] = self._run(
+                    current, lambda db: db.scalar(select(Book.edition).where(Book.id == book_id))
+                )
+            self._check_book_natural_key(
+                book.title, fields["edition"], book.publisher_id, book_id=book_id
+            )
+
+        if target == current:
+
+            def update_in_place(db: Session) -> Optional[Book]:
+                if services.update_book(db, book_id, book) is None:
+                    return None
+                return services.get_book(db, book_id)
+
+            return self._run(current, update_in_place)
+
+        existing = self._run(current, lambda db: services.get_book(db, book_id))
+        if existing is None:
+            return None
+        fields = {
+            "title": existing.title,
+            "edition": existing.edition,
+            "published_date": existing.published_date,
+            "author_ids": [author.id for author in existing.authors],
+        }
+        fields.update(book.model_dump(exclude_unset=True))
+        if fields["author_ids"] is None:
+            fields["author_ids"] = [author.id for author in existing.authors]
+        moved = BookCreate(**fields)
+
+        self._run(target, lambda db: services.create_book(db, moved, book_id=book_id))
+        self._run(current, lambda db: services.delete_book(db, book_id))
+        # The delete on the old shard dropped the book from the index.
+        related_index.apply(
+            {
+                book_id: (
+                    moved.genre_id, moved.publisher_id, moved.published_date, moved.author_ids
+                )
+            }
+        )
+        return self._run(target, lambda db: services.get_book(db, book_id))
+
+    def delete_book(self, book_id: int) -> bool:
+        shard = self._locate(book_id)
+        if shard is None:
+            return False
+        return self._run(shard, lambda db: services.delete_book(db, book_id))
+
+    def create_author(self, author: AuthorCreate) -> dict:
+        created = self._run(0, lambda db: services.create_author(db, author))
+        values = {column.name: getattr(created, column.name) for column in Author.__table__.columns}
+        self._each(lambda db: self._merge(db, Author, [values]), range(1, self.count))
+        return {**values, "books": []}
+
+    def update_author(self, author_id: int, author: AuthorUpdate) -> Optional[dict]:
+        updated = self._each(lambda db: services.update_author(db, author_id, author) is not None)
+        if not updated[0]:
+            return None
+        return self.get_author(author_id)
+
+    def delete_author(self, author_id: int) -> bool:
+        num_books = sum(
+            self._each(
+                lambda db: db.query(book_authors)
+                .filter(book_authors.c.author_id == author_id)
+                .count()
+            )
+        )
+        if num_books:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot delete author with {num_books} associated book(s)",
+            )
+        return self._each(lambda db: services.delete_author(db, author_id))[0]
+
+    # Tooling
+
+    @staticmethod
+    def _merge(db: Session, model, rows: List[dict]) -> None:
+        for values in rows:
+            db.merge(model(**values))
+        db.commit()
+
+    def init(self) -> None:
+        for shard_engine in self.engines:
+            create_schema(shard_engine)
+        sequence_metadata.create_all(bind=self.engines[0])
+        self._each(listing.ensure)
+
+        last_id = max(
+            self._each(lambda db: db.execute(select(func.max(Book.id))).scalar() or 0)
+        )
+        with self.engines[0].begin() as conn:
+            if conn.execute(select(book_id_sequence.c.id)).first() is None:
+                conn.execute(insert(book_id_sequence).values(id=1, last_id=last_id))
+
+    def sync_reference(self) -> Dict[str, int]:
+        """Make every shard's genres, publishers and authors match shard 0."""
+        copied = {}
+        with self.session(0) as primary:
+            for model in REFERENCE_MODELS:
+                table = model.__table__
+                rows = [dict(row) for row in primary.execute(select(table)).mappings()]
+                ids = [row["id"] for row in rows]
+
+                def copy(db: Session) -> None:
+                    db.execute(delete(table).where(table.c.id.not_in(ids)))
+                    if rows:
+                        db.execute(insert(table).prefix_with("OR REPLACE"), rows)
+                    db.commit()
+
+                self._each(copy, range(1, self.count))
+                copied[table.name] = len(rows)
+        # Listing rows carry genre, publisher and author names.
+        self._each(listing.rebuild, range(1, self.count))
+        return copied
+
+    def rebalance(self, batch_size: int = 500) -> Dict[str, int]:
+        """Move every book (and its links) that is not on the shard its key maps to."""
+        books = Book.__table__
+        moved = {}
+        for source in range(self.count):
+            with self.session(source) as db:
+                placement = db.execute(select(books.c.id, books.c.publisher_id)).all()
+            misplaced = [
+                (book_id, self.shard_for(book_id, publisher_id))
+                for book_id, publisher_id in placement
+                if self.shard_for(book_id, publisher_id) != source
+            ]
+
+            for start in range(0, len(misplaced), batch_size):
+                batch = misplaced[start : start + batch_size]
+                with self.session(source) as src:
+                    for target in {target for _, target in batch}:
+                        ids = [book_id for book_id, t in batch if t == target]
+                        rows = src.execute(select(books).where(books.c.id.in_(ids))).mappings().all()
+                        links = (
+                            src.execute(select(book_authors).where(book_authors.c.book_id.in_(ids)))
+                            .mappings()
+                            .all()
+                        )
+                        # Copy first, then delete from the source.
+                        with self.session(target) as dst:
+                            dst.execute(insert(books).prefix_with("OR REPLACE"), [dict(r) for r in rows])
+                            if links:
+                                dst.execute(
+                                    insert(book_authors).prefix_with("OR IGNORE"),
+                                    [dict(link) for link in links],
+                                )
+                            dst.commit()
+                        src.execute(delete(book_authors).where(book_authors.c.book_id.in_(ids)))
+                        src.execute(delete(books).where(books.c.id.in_(ids)))
+                        src.commit()
+                        key = f"{source}->{target}"
+                        moved[key] = moved.get(key, 0) + len(ids)
+        if moved:
+            self.rebuild_listing()
+        return moved
+
+    def check_listing(self) -> List[dict]:
+        return self._each(listing.check)
+
+    def rebuild_listing(self) -> List[int]:
+        return self._each(listing.rebuild)
+
+
+def make_shard_router(urls: List[str], shard_key: str) -> ShardRouter:
+    engines = [engine]
+    session_factories = [SessionLocal]
+    for url in urls:
+        shard_engine = create_engine(url, connect_args={"check_same_thread": False})
+        slow_query_log.attach(shard_engine)
+        statement_cache_stats.attach(shard_engine)
+        timeouts.attach(shard_engine)
+        engines.append(shard_engine)
+        session_factories.append(
+            sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+        )
+    return ShardRouter(engines, session_factories, shard_key)
+
+
+shard_router: Optional[ShardRouter] = (
+    make_shard_router(settings.shard_urls, settings.shard_key) if settings.shard_urls else None
+)
+
+
+def get_shards() -> Optional[ShardRouter]:
+    return shard_router
+
+
+if __name__ == "__main__":
+    commands = {
+        "init": lambda router: router.init(),
+        "sync-reference": lambda router: router.sync_reference(),
+        "rebalance": lambda router: router.rebalance(),
+    }
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(f"Usage: python -m app.sharding {{{'|'.join(commands)}}}")
+        sys.exit(1)
+    if shard_router is None:
+        print("Sharding is not configured; set SHARD_URLS")
+        sys.exit(1)
+    print(commands[sys.argv[1]](shard_router) or "Done")
@@ -0,0 +1,407 @@
+"""Read-only catalog snapshots.
+
+A snapshot is the whole catalog compiled into one columnar file. The file is
+memory-mapped, so every worker process serving it shares the same pages
+through the OS page cache, and lookups read straight from the mapping.
+
+Layout: a header (magic, format version, build time, section count), a
+directory of named sections, then the sections themselves, each an 8-byte
+aligned native-endian array:
+
+- ``<table>.<column>``: int64 values, int32 date ordinals or, for strings,
+  ``.off`` (int64 offsets, one more than rows) and ``.data`` (UTF-8 bytes)
+- ``<table>.<column>.null``: one byte per row for nullable columns
+- ``<table>.sort.<column>`` / ``<table>.rank.<column>``: row order for an
+  ascending sort, and each row's position in it
+- ``books.authors`` / ``authors.books``: the links, as ``.off``/``.rows``
+
+Rows are stored in id order, so ``<table>.id`` doubles as the id index.
+
+Build one with ``python -m app.snapshot build books.snapshot`` and serve it
+by setting ``SNAPSHOT_PATH``; write endpoints are then disabled.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import Date, Integer, select
+from sqlalchemy.orm import Session
+
+from app.models import Author, Book, Genre, Publisher, book_authors
+from app.related import RelatedIndex
+
+MAGIC = b"BOOKSNAP"
+VERSION = 1
+
+_HEADER = struct.Struct("=8sIQI")  # magic, version, built_at, section count
+_ENTRY = struct.Struct("=48s4sQQ")  # name, typecode, offset, item count
+
+MODELS = {
+    "genres": Genre,
+    "publishers": Publisher,
+    "authors": Author,
+    "books": Book,
+}
+SORTED_TABLES = ("authors", "books")
+# Internal bookkeeping that readers never see; leaving it out also keeps the
+# layout of snapshots built before the column existed.
+EXCLUDED_COLUMNS = {"content_hash"}
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _kind(column) -> str:
+    if isinstance(column.type, Integer):
+        return "int"
+    if isinstance(column.type, Date):
+        return "date"
+    return "str"
+
+
+def _columns(model) -> list:
+    return [column for column in model.__table__.columns if column.name not in EXCLUDED_COLUMNS]
+
+
+def sort_key(value):
+    # SQLite sorts NULLs first in ascending order.
+    return (value is not None, value)
+
+
+def build_snapshot(db: Session, path: str) -> Dict[str, int]:
+    sections: List[tuple] = []
+    row_of: Dict[str, Dict[int, int]] = {}
+    counts: Dict[str, int] = {}
+
+    for table_name, model in MODELS.items():
+        columns = _columns(model)
+        rows = db.execute(select(*columns).order_by(model.__table__.c.id)).all()
+        counts[table_name] = len(rows)
+        row_of[table_name] = {row.id: index for index, row in enumerate(rows)}
+
+        for position, column in enumerate(columns):
+            values = [row[position] for row in rows]
+            prefix = f"{table_name}.{column.name}"
+            kind = _kind(column)
+
+            if kind == "int":
+                sections.append((prefix, array("q", (v or 0 for v in values))))
+            elif kind == "date":
+                sections.append((prefix, array("i", (v.toordinal() if v else 0 for v in values))))
+            else:
+                offsets = array("q", [0])
+                data = bytearray()
+                for value in values:
+                    data += (value or "").encode()
+                    offsets.append(len(data))
+                sections.append((f"{prefix}.off", offsets))
+                sections.append((f"{prefix}.data", array("B", data)))
+
+            if column.nullable and not column.primary_key:
+                sections.append((f"{prefix}.null", array("B", (v is None for v in values))))
+
+            if table_name in SORTED_TABLES:
+                order = sorted(range(len(values)), key=lambda i: sort_key(values[i]))
+                rank = array("q", [0]) * len(order)
+                for position_in_order, row in enumerate(order):
+                    rank[row] = position_in_order
+                sections.append((f"{table_name}.sort.{column.name}", array("q", order)))
+                sections.append((f"{table_name}.rank.{column.name}", rank))
+
+    links = db.execute(select(book_authors.c.book_id, book_authors.c.author_id)).all()
+    book_rows, author_rows = row_of["books"], row_of["authors"]
+    pairs = [(book_rows[book_id], author_rows[author_id]) for book_id, author_id in links]
+    sections += _adjacency("books.authors", counts["books"], pairs)
+    sections += _adjacency("authors.books", counts["authors"], [(a, b) for b, a in pairs])
+
+    _write(path, sections)
+    return counts
+
+
+def _adjacency(name: str, size: int, pairs: Iterable[tuple]) -> List[tuple]:
+    targets: List[List[int]] = [[] for _ in range(size)]
+    for source, target in pairs:
+        targets[source].append(target)
+
+    offsets = array("q", [0])
+    rows = array("q")
+    for row_targets in targets:
+        rows.extend(sorted(row_targets))
+        offsets.append(len(rows))
+    return [(f"{name}.off", offsets), (f"{name}.rows", rows)]
+
+
+def _write(path: str, sections: List[tuple]) -> None:
+    entries = []
+    offset = _align(_HEADER.size + len(sections) * _ENTRY.size)
+    for name, values in sections:
+        entries.append((name.encode(), values.typecode.encode(), offset, len(values)))
+        offset = _align(offset + len(values) * values.itemsize)
+
+    # Written beside the target and renamed into place, so processes that
+    # still map the previous snapshot keep a consistent view of it.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, int(time.time()), len(sections)))
+        for entry in entries:
+            f.write(_ENTRY.pack(*entry))
+        for (_, values), (_, _, section_offset, _) in zip(sections, entries):
+            f.seek(section_offset)
+            f.write(values.tobytes())
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, self.version, self.built_at, count = _HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a catalog snapshot")
+        if self.version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version {self.version} in {path}")
+
+        self._sections: Dict[str, memoryview] = {}
+        for index in range(count):
+            name, typecode, offset, items = _ENTRY.unpack_from(
+                self._view, _HEADER.size + index * _ENTRY.size
+            )
+            typecode = typecode.rstrip(b"\0").decode()
+            size = items * array(typecode).itemsize
+            self._sections[name.rstrip(b"\0").decode()] = self._view[offset : offset + size].cast(
+                typecode
+            )
+
+        self._columns = {
+            table_name: [(column.name, _kind(column)) for column in _columns(model)]
+            for table_name, model in MODELS.items()
+        }
+        self._related = RelatedIndex()
+
+    def close(self) -> None:
+        for section in getattr(self, "_sections", {}).values():
+            section.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def info(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "built_at": self.built_at,
+            "counts": {name: self._count(name) for name in MODELS},
+        }
+
+    def _count(self, table: str) -> int:
+        return len(self._sections[f"{table}.id"])
+
+    def _row_for_id(self, table: str, item_id: int) -> Optional[int]:
+        ids = self._sections[f"{table}.id"]
+        row = bisect_left(ids, item_id)
+        if row < len(ids) and ids[row] == item_id:
+            return row
+        return None
+
+    def _value(self, table: str, column: str, kind: str, row: int):
+        nulls = self._sections.get(f"{table}.{column}.null")
+        if nulls is not None and nulls[row]:
+            return None
+        if kind == "int":
+            return self._sections[f"{table}.{column}"][row]
+        if kind == "date":
+            return date.fromordinal(self._sections[f"{table}.{column}"][row])
+        offsets = self._sections[f"{table}.{column}.off"]
+        data = self._sections[f"{table}.{column}.data"]
+        return str(data[offsets[row] : offsets[row + 1]], "utf-8")
+
+    def _row(self, table: str, row: int) -> dict:
+        return {
+            column: self._value(table, column, kind, row)
+            for column, kind in self._columns[table]
+        }
+
+    def _linked(self, name: str, row: int) -> Sequence[int]:
+        offsets = self._sections[f"{name}.off"]
+        return self._sections[f"{name}.rows"][offsets[row] : offsets[row + 1]]
+
+    def _page(
+        self,
+        table: str,
+        skip: int,
+        limit: int,
+        sort_by: Optional[str],
+        order: str,
+        rows: Optional[Sequence[int]] = None,
+        predicate=None,
+    ) -> List[int]:
+        sortable = sort_by in dict(self._columns[table])
+        if rows is None:
+            rows = self._sections[f"{table}.sort.{sort_by}"] if sortable else range(self._count(table))
+            if sortable and order == "desc":
+                rows = rows[::-1]
+        elif sortable:
+            rank = self._sections[f"{table}.rank.{sort_by}"]
+            rows = sorted(rows, key=rank.__getitem__, reverse=order == "desc")
+
+        matches = rows if predicate is None else (row for row in rows if predicate(row))
+        skip = max(skip, 0)
+        stop = None if limit < 0 else skip + limit
+        return list(islice(matches, skip, stop))
+
+    def _book_summary(self, row: int) -> dict:
+        book = self._row("books", row)
+        book["genre"] = self.get_genre(book["genre_id"])
+        book["publisher"] = self.get_publisher(book["publisher_id"])
+        return book
+
+    def get_authors(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        sort_by: Optional[str] = None,
+        order: str = "asc",
+    ) -> List[dict]:
+        rows = self._page("authors", skip, limit, sort_by, order)
+        return [self._row("authors", row) for row in rows]
+
+    def get_author(self, author_id: int) -> Optional[dict]:
+        row = self._row_for_id("authors", author_id)
+        if row is None:
+            return None
+        author = self._row("authors", row)
+        author["books"] = [self._book_summary(book) for book in self._linked("authors.books", row)]
+        return author
+
+    def get_books(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        author_id: Optional[int] = None,
+        genre_id: Optional[int] = None,
+        publisher_id: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        order: str = "asc",
+    ) -> List[dict]:
+        rows = None
+        if author_id:
+            author_row = self._row_for_id("authors", author_id)
+            if author_row is None:
+                return []
+            rows = self._linked("authors.books", author_row)
+
+        predicate = None
+        if genre_id or publisher_id:
+            genres = self._sections["books.genre_id"]
+            publishers = self._sections["books.publisher_id"]
+
+            def predicate(row: int) -> bool:
+                return (not genre_id or genres[row] == genre_id) and (
+                    not publisher_id or publishers[row] == publisher_id
+                )
+
+        rows = self._page("books", skip, limit, sort_by, order, rows, predicate)
+        return [self._book_summary(row) for row in rows]
+
+    def get_book(self, book_id: int) -> Optional[dict]:
+        row = self._row_for_id("books", book_id)
+        if row is None:
+            return None
+        book = self._book_summary(row)
+        book["authors"] = [self._row("authors", author) for author in self._linked("books.authors", row)]
+        return book
+
+    def build_related_index(self) -> None:
+        self._related.ensure_loaded(self._related_rows)
+
+    def get_related_books(self, book_id: int, limit: int = 10) -> Optional[List[dict]]:
+        self.build_related_index()
+        related_ids = self._related.related(book_id, limit)
+        if related_ids is None:
+            return None
+        return [self._book_summary(self._row_for_id("books", related)) for related in related_ids]
+
+    def _related_rows(self) -> Iterable[tuple]:
+        author_ids = self._sections["authors.id"]
+        return (
+            (
+                self._sections["books.id"][row],
+                self._sections["books.genre_id"][row],
+                self._sections["books.publisher_id"][row],
+                self._value("books", "published_date", "date", row),
+                [author_ids[author] for author in self._linked("books.authors", row)],
+            )
+            for row in range(self._count("books"))
+        )
+
+    def get_genres(self, skip: int = 0, limit: int = 100) -> List[dict]:
+        rows = self._page("genres", skip, limit, None, "asc")
+        return [self._row("genres", row) for row in rows]
+
+    def get_genre(self, genre_id: int) -> Optional[dict]:
+        row = self._row_for_id("genres", genre_id)
+        return None if row is None else self._row("genres", row)
+
+    def get_publishers(self, skip: int = 0, limit: int = 100) -> List[dict]:
+        rows = self._page("publishers", skip, limit, None, "asc")
+        return [self._row("publishers", row) for row in rows]
+
+    def get_publisher(self, publisher_id: int) -> Optional[dict]:
+        row = self._row_for_id("publishers", publisher_id)
+        return None if row is None else self._row("publishers", row)
+
+    def get_bootstrap(self, limit: int = 100) -> dict:
+        return {
+            "genres": self.get_genres(limit=-1),
+            "publishers": self.get_publishers(limit=-1),
+            "authors": self.get_authors(limit=limit),
+            "books": self.get_books(limit=limit),
+        }
+
+
+_snapshot: Optional[Snapshot] = None
+
+
+def load_snapshot(path: str) -> Snapshot:
+    global _snapshot
+    _snapshot = Snapshot(path)
+    return _snapshot
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    return _snapshot
+
+
+def require_writable(snapshot: Optional[Snapshot] = Depends(get_snapshot)) -> None:
+    if snapshot is not None:
+        raise HTTPException(status_code=405, detail="Catalog is served from a read-only snapshot")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        print("Usage: python -m app.snapshot build <output path>")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        counts = build_snapshot(db, sys.argv[2])
+    finally:
+        db.close()
+    print(f"Snapshot written to {sys.argv[2]}: {counts}")
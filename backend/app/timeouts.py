@@ -0,0 +1,170 @@
+"""Statement time budgets and cancellation on client disconnect.
+
+Every request gets a :class:`QueryBudget`. Each SQL statement it runs may
+take at most the route's ``statement_timeout_ms``, and once the client has
+disconnected no statement may run at all. SQLite calls a progress handler
+every ``PROGRESS_STEPS`` virtual machine instructions; when the current
+request's budget is spent the handler returns non-zero, SQLite aborts the
+statement and the driver raises ``OperationalError: interrupted``. The
+request then fails with 504 (timeout) or 499 (client gone) and its
+connection and worker thread are freed.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.admission import EXEMPT_PATHS, _route_key
+
+PROGRESS_STEPS = 1000
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+class QueryBudget:
+    def __init__(self, timeout_ms: float = 0):
+        self.timeout = timeout_ms / 1000 if timeout_ms > 0 else None
+        self.deadline: Optional[float] = None
+        self.cancelled = False
+        self.interrupted: Optional[str] = None
+
+    def start_statement(self) -> None:
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+
+    def should_interrupt(self) -> bool:
+        if self.cancelled:
+            reason = CANCELLED
+        elif self.deadline is not None and time.monotonic() > self.deadline:
+            reason = TIMEOUT
+        else:
+            return False
+        if self.interrupted is None:
+            self.interrupted = reason
+            query_stats.outcomes[f"interrupted_{reason}"] += 1
+        return True
+
+
+current_budget: ContextVar[Optional[QueryBudget]] = ContextVar("current_budget", default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.outcomes: Counter = Counter()
+
+    def stats(self) -> dict:
+        return {
+            "timeouts": self.outcomes[f"interrupted_{TIMEOUT}"],
+            "cancelled_statements": self.outcomes[f"interrupted_{CANCELLED}"],
+            "disconnected_requests": self.outcomes["disconnected"],
+        }
+
+
+def interrupted() -> bool:
+    """Whether the current request's statements were interrupted."""
+    budget = current_budget.get()
+    return budget is not None and budget.interrupted is not None
+
+
+def _progress() -> int:
+    budget = current_budget.get()
+    return 1 if budget is not None and budget.should_interrupt() else 0
+
+
+def _set_progress_handler(dbapi_connection, connection_record):
+    dbapi_connection.set_progress_handler(_progress, PROGRESS_STEPS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    budget = current_budget.get()
+    if budget is not None:
+        budget.start_statement()
+
+
+def attach(engine: Engine) -> None:
+    """Enforce the current request's budget on statements run through ``engine``."""
+    if engine.dialect.name != "sqlite":
+        return
+    event.listen(engine, "connect", _set_progress_handler)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+async def interrupted_handler(request: Request, exc: OperationalError) -> Response:
+    budget = current_budget.get()
+    if budget is None or budget.interrupted is None:
+        raise exc
+    if budget.interrupted == TIMEOUT:
+        return JSONResponse({"detail": "Query exceeded its time budget"}, status_code=504)
+    # Nobody is listening; nginx's "client closed request".
+    return Response(status_code=499)
+
+
+class QueryBudgetMiddleware:
+    """Gives each request a statement budget and cancels it if the client leaves.
+
+    The client's receive channel is read by a background task so that an
+    ``http.disconnect`` is seen while the endpoint is still running; the app
+    reads the same messages from a queue.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        timeout_ms: float,
+        route_timeouts_ms: Optional[Dict[str, float]] = None,
+    ):
+        self.app = app
+        self.timeout_ms = timeout_ms
+        self.route_timeouts_ms = route_timeouts_ms or {}
+
+    def _timeout_for(self, scope: Scope) -> float:
+        if self.route_timeouts_ms:
+            route_key = _route_key(scope)
+            if route_key in self.route_timeouts_ms:
+                return self.route_timeouts_ms[route_key]
+        return self.timeout_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        budget = QueryBudget(self._timeout_for(scope))
+        messages: asyncio.Queue = asyncio.Queue()
+        responded = False
+
+        async def listen() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not responded:
+                        budget.cancelled = True
+                        query_stats.outcomes["disconnected"] += 1
+                    return
+
+        async def send_and_track(message: Message) -> None:
+            nonlocal responded
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                responded = True
+            await send(message)
+
+        listener = asyncio.create_task(listen())
+        token = current_budget.set(budget)
+        try:
+            await self.app(scope, messages.get, send_and_track)
+        finally:
+            current_budget.reset(token)
+            listener.cancel()
+
+
+query_stats = QueryStats()
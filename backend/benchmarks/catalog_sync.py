@@ -0,0 +1,76 @@
+"""Benchmark PUT /sync's diffing on a synthetic catalog in a temporary file.
+
+Times the first (all inserts) sync, a repeat no-op sync and a sync where 1%
+of the books changed, with the bytes written to the database file for each.
+
+Usage: python -m benchmarks.catalog_sync [books]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Genre, Publisher
+from app.schemas import CatalogSync
+from app.sync import sync_catalog
+
+
+def make_feed(num_books: int, rng: random.Random) -> list:
+    num_authors = max(num_books // 4, 1)
+    return [
+        {
+            "title": f"Book {i}",
+            "edition": "1st",
+            "published_date": f"{rng.randint(1900, 2020)}-01-01",
+            "publisher_id": rng.randint(1, 50),
+            "genre_id": rng.randint(1, 10),
+            "authors": [
+                {"name": "Author", "surname": str(a), "birth_year": 1900 + a % 100}
+                for a in rng.sample(range(num_authors), rng.randint(1, 2))
+            ],
+        }
+        for i in range(num_books)
+    ]
+
+
+def timed_sync(engine, path: str, payload: CatalogSync, label: str) -> None:
+    size_before = os.path.getsize(path)
+    started = time.perf_counter()
+    with Session(engine) as db:
+        result = sync_catalog(db, payload)
+    elapsed = time.perf_counter() - started
+    grown = os.path.getsize(path) - size_before
+    print(f"{label:<12}{elapsed:>8.2f}s  file +{grown:,} bytes  {result['books']}")
+
+
+def main(num_books: int = 1_000_000) -> None:
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add_all(Genre(name=f"Genre {i}") for i in range(10))
+            db.add_all(Publisher(name=f"Publisher {i}") for i in range(50))
+            db.commit()
+
+        books = make_feed(num_books, rng)
+        started = time.perf_counter()
+        payload = CatalogSync(books=books)
+        print(f"validated {num_books:,} records in {time.perf_counter() - started:.2f}s")
+
+        timed_sync(engine, path, payload, "initial")
+        timed_sync(engine, path, payload, "no-op")
+        for book in rng.sample(books, max(num_books // 100, 1)):
+            book["published_date"] = "2021-01-01"
+        timed_sync(engine, path, CatalogSync(books=books), "1% changed")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""Benchmark "related books" scoring on a synthetic catalog.
+
+Usage: python -m benchmarks.related_books [books] [queries]
+"""
+
+import random
+import sys
+import time
+from datetime import date
+
+from app.related import RelatedIndex
+
+
+def main(num_books: int = 1_000_000, num_queries: int = 200) -> None:
+    rng = random.Random(42)
+    num_authors = num_books // 4
+    index = RelatedIndex(capacity=num_books)
+
+    started = time.perf_counter()
+    for book_id in range(1, num_books + 1):
+        index.upsert(
+            book_id,
+            genre_id=rng.randint(1, 50),
+            publisher_id=rng.randint(1, 500),
+            published=date.fromordinal(rng.randint(693_596, 738_885)),
+            author_ids=rng.sample(range(1, num_authors + 1), rng.randint(1, 3)),
+        )
+    print(f"built index of {num_books:,} books in {time.perf_counter() - started:.1f}s")
+
+    timings = []
+    for _ in range(num_queries):
+        book_id = rng.randint(1, num_books)
+        started = time.perf_counter()
+        index.related(book_id, limit=10)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(
+        f"related(limit=10) over {num_queries} queries: "
+        f"p50 {timings[len(timings) // 2] * 1000:.1f}ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:.1f}ms"
+    )
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        index.upsert(rng.randint(1, num_books), 1, 1, date(2000, 1, 1), [1, 2])
+    print(f"incremental upsert: {(time.perf_counter() - started) * 1000:.3f}us per book")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,111 @@
+"""Per-call overhead of the hot service reads, legacy Query vs cached statements.
+
+The catalog is tiny and in memory so statement construction and compilation,
+not SQLite, dominate the timings. The current get_books reads the flattened
+book_listing table rather than joining.
+
+Usage: python -m benchmarks.service_overhead [calls]
+"""
+
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.pool import StaticPool
+
+from app import listing, services
+from app.database import Base
+from app.diagnostics import StatementCacheStats
+from app.models import Author, Book, Genre, Publisher
+
+
+def legacy_get_books(db, genre_id=None, sort_by=None):
+    query = db.query(Book).options(
+        joinedload(Book.genre), joinedload(Book.publisher), joinedload(Book.authors)
+    )
+    if genre_id:
+        query = query.filter(Book.genre_id == genre_id)
+    if sort_by:
+        query = query.order_by(getattr(Book, sort_by))
+    return query.offset(0).limit(100).all()
+
+
+def legacy_get_book(db, book_id):
+    return (
+        db.query(Book)
+        .options(joinedload(Book.genre), joinedload(Book.publisher), joinedload(Book.authors))
+        .filter(Book.id == book_id)
+        .first()
+    )
+
+
+def legacy_get_author(db, author_id):
+    return (
+        db.query(Author)
+        .options(joinedload(Author.books).joinedload(Book.genre))
+        .options(joinedload(Author.books).joinedload(Book.publisher))
+        .filter(Author.id == author_id)
+        .first()
+    )
+
+
+def legacy_validate(db, author_ids, genre_id, publisher_id):
+    db.query(Author).filter(Author.id.in_(author_ids)).count()
+    db.query(Author).filter(Author.id.in_(author_ids)).all()
+    db.query(Genre).filter(Genre.id == genre_id).first()
+    db.query(Publisher).filter(Publisher.id == publisher_id).first()
+
+
+def current_validate(db, author_ids, genre_id, publisher_id):
+    services._authors_by_ids(db, author_ids)
+    services._check_genre_and_publisher(db, genre_id, publisher_id)
+
+
+CASES = [
+    ("get_books", lambda db: legacy_get_books(db, 1, "title"),
+     lambda db: services.get_books(db, genre_id=1, sort_by="title")),
+    ("get_book", lambda db: legacy_get_book(db, 3), lambda db: services.get_book(db, 3)),
+    ("get_author", lambda db: legacy_get_author(db, 1), lambda db: services.get_author(db, 1)),
+    ("book validation", lambda db: legacy_validate(db, [1, 2], 1, 1),
+     lambda db: current_validate(db, [1, 2], 1, 1)),
+]
+
+
+def timed(engine, fn, calls: int) -> float:
+    with Session(engine) as db:
+        fn(db)
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn(db)
+            db.expunge_all()
+        return (time.perf_counter() - started) / calls * 1e6
+
+
+def main(calls: int = 2000) -> None:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    cache_stats = StatementCacheStats()
+    cache_stats.attach(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        genre, publisher = Genre(name="Fiction"), Publisher(name="Penguin")
+        authors = [Author(name=f"A{i}", surname="S", birth_year=1900) for i in range(3)]
+        db.add_all(
+            Book(title=f"Book {i}", genre=genre, publisher=publisher, authors=authors[: i % 3 + 1])
+            for i in range(20)
+        )
+        db.commit()
+        listing.rebuild(db)
+
+    print(f"{'call':<16}{'legacy (us)':>14}{'cached (us)':>14}{'speedup':>10}")
+    for name, legacy, current in CASES:
+        before = timed(engine, legacy, calls)
+        after = timed(engine, current, calls)
+        print(f"{name:<16}{before:>14.1f}{after:>14.1f}{before / after:>9.2f}x")
+    print(f"compiled cache: {cache_stats.stats()}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController, AdmissionMiddleware, AdmissionPool
+
+
+def test_pool_admits_up_to_limit_then_queues_and_rejects():
+    async def scenario():
+        pool = AdmissionPool("read", limit=1, max_queue=1, queue_timeout=1.0)
+        assert await pool.acquire() is True
+
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+        assert pool.queued == 1
+
+        assert await pool.acquire() is False
+        assert pool.rejected == 1
+
+        pool.release()
+        assert await waiter is True
+        assert pool.in_flight == 1
+        pool.release()
+        assert pool.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_pool_times_out_queued_request():
+    async def scenario():
+        pool = AdmissionPool("write", limit=1, max_queue=4, queue_timeout=0.01)
+        await pool.acquire()
+        assert await pool.acquire() is False
+        assert pool.timed_out == 1
+        assert pool.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_controller_routes_by_method_and_override():
+    controller = AdmissionController(
+        read_limit=8,
+        read_queue=8,
+        write_limit=1,
+        write_queue=1,
+        queue_timeout=1.0,
+        route_limits={"GET /books": 2},
+    )
+    assert controller.pool_for("GET", "GET /authors") is controller.read
+    assert controller.pool_for("DELETE", "DELETE /books/{book_id}") is controller.write
+    assert controller.pool_for("GET", "GET /books").limit == 2
+
+
+def test_middleware_sheds_with_retry_after():
+    controller = AdmissionController(
+        read_limit=0, read_queue=0, write_limit=1, write_queue=1, queue_timeout=1.0
+    )
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller, retry_after=3)
+
+    @app.get("/things")
+    def things():
+        return []
+
+    response = TestClient(app).get("/things")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert controller.read.rejected == 1
@@ -1,10 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
+from app import services
+from app.config import settings
 from app.database import Base, get_db
 from app.main import app
+from app.timeouts import current_budget
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -44,3 +48,55 @@ def test_get_authors_empty():
 def test_get_genres():
     response = client.get("/genres")
     assert response.status_code == 200
+
+
+def test_bootstrap_returns_first_page_with_etag():
+    client.post("/authors", json={"name": "Isaac", "surname": "Asimov", "birth_year": 1920})
+    response = client.get("/bootstrap")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"genres", "publishers", "authors", "books"}
+    assert [a["surname"] for a in data["authors"]] == ["Asimov"]
+    etag = response.headers["etag"]
+
+    cached = client.get("/bootstrap", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    client.post("/authors", json={"name": "Ursula", "surname": "Le Guin", "birth_year": 1929})
+    changed = client.get("/bootstrap", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_list_limit_is_capped(monkeypatch):
+    for surname in ["Asimov", "Clarke", "Herbert"]:
+        client.post("/authors", json={"name": "A", "surname": surname, "birth_year": 1920})
+    monkeypatch.setattr(settings, "max_page_size", 2)
+
+    assert len(client.get("/authors?limit=1000000").json()) == 2
+    assert len(client.get("/authors?limit=-1").json()) == 2
+    assert len(client.get("/authors?limit=1").json()) == 1
+
+
+def test_interrupted_create_is_not_reported_as_bad_request(monkeypatch):
+    def interrupted_create(db, item):
+        current_budget.get().interrupted = "timeout"
+        raise OperationalError("INSERT", {}, Exception("interrupted"))
+
+    monkeypatch.setattr(services, "create_author", interrupted_create)
+    monkeypatch.setattr(services, "create_book", interrupted_create)
+    author = {"name": "Isaac", "surname": "Asimov", "birth_year": 1920}
+    assert client.post("/authors", json=author).status_code == 504
+    book = {"title": "Foundation", "publisher_id": 1, "genre_id": 1}
+    assert client.post("/books", json=book).status_code == 504
+
+
+def test_author_with_missing_fields_is_a_bad_request():
+    response = client.post("/authors", json={"name": "X"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Could not create author"
+
+    created = client.post("/authors", json={"name": "A", "surname": "B", "birth_year": 1})
+    duplicate = client.post("/authors", json={"name": "A", "surname": "B", "birth_year": 1})
+    assert (created.status_code, duplicate.status_code) == (201, 409)
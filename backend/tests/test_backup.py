@@ -0,0 +1,48 @@
+import gzip
+import sqlite3
+
+import pytest
+
+from app.backup import BackupManager, sqlite_path
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "books.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.executemany("INSERT INTO books (title) VALUES (?)", [("x" * 500,)] * 200)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_backup_is_compressed_verified_and_restorable(database, tmp_path):
+    manager = BackupManager([database], str(tmp_path / "backups"), pages_per_step=2, step_sleep=0)
+    steps = []
+
+    (result,) = manager.run(on_progress=lambda progress: steps.append(progress["pages_done"]))
+
+    assert result["integrity"] == "ok"
+    assert result["pages"] > 2
+    assert len(steps) > 1
+    assert manager.status()["progress"] == {"state": "idle"}
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(tmp_path / "backups" / result["file"]) as gz:
+        restored.write_bytes(gz.read())
+    count = sqlite3.connect(restored).execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    assert count == 200
+
+
+def test_retention_keeps_newest_backups(database, tmp_path):
+    manager = BackupManager([database], str(tmp_path / "backups"), step_sleep=0, retention=2)
+    files = [manager.run()[0]["file"] for _ in range(3)]
+
+    assert [backup["file"] for backup in manager.backups()] == files[:0:-1]
+
+
+def test_only_sqlite_files_can_be_backed_up():
+    assert sqlite_path("sqlite:///./data/books.db") == "./data/books.db"
+    with pytest.raises(ValueError):
+        sqlite_path("sqlite://")
@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.coalescing import SingleFlight, SingleFlightMiddleware
+
+
+def make_app(single_flight):
+    app = FastAPI()
+    app.add_middleware(SingleFlightMiddleware, single_flight=single_flight)
+    app.state.calls = 0
+
+    @app.get("/books")
+    async def books(genre_id: int = 0, sort_by: str = ""):
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return [{"genre_id": genre_id, "sort_by": sort_by}]
+
+    @app.post("/books")
+    async def create_book():
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return {}
+
+    return app
+
+
+def run_concurrently(app, method, urls):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.request(method, url) for url in urls))
+
+    return asyncio.run(scenario())
+
+
+def test_identical_gets_share_one_execution():
+    single_flight = SingleFlight()
+    app = make_app(single_flight)
+    urls = ["/books?genre_id=1&sort_by=published_date"] * 4 + [
+        "/books?sort_by=published_date&genre_id=1"
+    ]
+
+    responses = run_concurrently(app, "GET", urls)
+
+    assert app.state.calls == 1
+    assert len({response.content for response in responses}) == 1
+    stats = single_flight.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_different_queries_are_not_coalesced():
+    app = make_app(SingleFlight())
+    run_concurrently(app, "GET", ["/books?genre_id=1", "/books?genre_id=2"])
+    assert app.state.calls == 2
+
+
+def test_writes_are_never_coalesced():
+    app = make_app(SingleFlight())
+    run_concurrently(app, "POST", ["/books"] * 3)
+    assert app.state.calls == 3
+
+
+def test_profiled_requests_run_on_their_own():
+    app = make_app(SingleFlight())
+
+    @app.get("/profiled")
+    async def profiled():
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return JSONResponse({}, headers={"X-Profile-Id": "7"})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            profiled_requests = [
+                client.get("/books", headers={"X-Profile": "token"}) for _ in range(2)
+            ]
+            plain = [client.get("/profiled") for _ in range(3)]
+            return await asyncio.gather(*profiled_requests, *plain)
+
+    responses = asyncio.run(scenario())
+    assert app.state.calls == 3
+    assert sum("x-profile-id" in response.headers for response in responses[2:]) == 1
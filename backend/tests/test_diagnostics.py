@@ -0,0 +1,92 @@
+import time
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, literal_column, select, text
+
+from app.config import settings
+from app.diagnostics import (
+    ProfiledRoute,
+    ProfileStore,
+    ProfilingMiddleware,
+    SlowQueryLog,
+    StatementCacheStats,
+)
+from app.main import app
+
+
+def test_slow_query_log_records_statement_parameters_and_plan():
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=0, size=10)
+    log.attach(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT)"))
+        conn.execute(text("SELECT * FROM books WHERE title = :title"), {"title": "Dune"})
+
+    entry = log.entries()[0]
+    assert entry["statement"].startswith("SELECT * FROM books")
+    assert "Dune" in entry["parameters"]
+    assert any("SCAN" in step for step in entry["plan"])
+
+
+def test_slow_query_log_skips_fast_statements():
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=10_000, size=10)
+    log.attach(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert log.entries() == []
+
+
+def test_profile_requested_with_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    store = ProfileStore(size=5)
+    profiled_app = FastAPI()
+    profiled_app.add_middleware(ProfilingMiddleware, store=store, sample_rate=0, interval=0.001)
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/slow")
+    def slow_endpoint():
+        time.sleep(0.05)
+        return {}
+
+    profiled_app.include_router(router)
+    client = TestClient(profiled_app)
+
+    assert "x-profile-id" not in client.get("/slow", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/slow", headers={"X-Profile": "secret"})
+    profile = store.get(int(response.headers["x-profile-id"]))
+    assert profile.samples > 0
+    assert "slow_endpoint" in profile.folded()
+    assert store.list()[0]["path"] == "/slow"
+
+
+def test_admin_endpoints_require_token_when_configured(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/admin/slow-queries").status_code == 403
+    response = client.get("/admin/slow-queries", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+
+
+def test_admin_endpoints_are_closed_without_a_token(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "admin_token", None)
+    assert client.get("/admin/slow-queries").status_code == 403
+    assert client.post("/admin/listing", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def test_statement_cache_stats_count_hits():
+    engine = create_engine("sqlite://")
+    stats = StatementCacheStats()
+    stats.attach(engine)
+    with engine.connect() as conn:
+        for value in range(3):
+            conn.execute(select(literal_column("1")).where(literal_column("1") == value))
+
+    result = stats.stats()
+    assert result["misses"] == 1
+    assert result["hits"] == 2
+    assert result["cached_statements"] >= 1
@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app import listing
+from app.database import Base
+from app.models import Book, BookListing, Genre, Publisher
+from app.schemas import AuthorCreate, AuthorUpdate, BookCreate, BookUpdate
+from app.services import (
+    create_author,
+    create_book,
+    delete_book,
+    get_books,
+    update_author,
+    update_book,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add_all([Genre(name="Science Fiction"), Publisher(name="Penguin"), Publisher(name="Tor")])
+    db.commit()
+    yield db
+    db.close()
+
+
+def new_book(title, author_ids, publisher_id=1):
+    return BookCreate(title=title, genre_id=1, publisher_id=publisher_id, author_ids=author_ids)
+
+
+def test_writes_keep_listing_in_step(db):
+    asimov = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    clarke = create_author(db, AuthorCreate(name="Arthur", surname="Clarke", birth_year=1917))
+    book = create_book(db, new_book("Foundation", [asimov.id]))
+
+    (row,) = get_books(db)
+    assert (row.title, row.genre_name, row.publisher_name) == ("Foundation", "Science Fiction", "Penguin")
+    assert row.author_names == "Isaac Asimov"
+
+    update_book(db, book.id, BookUpdate(title="Foundation", genre_id=1, publisher_id=2,
+                                        author_ids=[asimov.id, clarke.id]))
+    update_author(db, clarke.id, AuthorUpdate(name="Arthur C.", surname="Clarke", birth_year=1917))
+    db.expire_all()
+    (row,) = get_books(db, author_id=clarke.id)
+    assert row.publisher == {"id": 2, "name": "Tor", "website": None, "description": None,
+                             "creation_date": None}
+    assert row.author_names == "Isaac Asimov, Arthur C. Clarke"
+    assert listing.check(db)["consistent"]
+
+    delete_book(db, book.id)
+    assert get_books(db) == []
+    assert listing.check(db)["listing_rows"] == 0
+
+
+def test_failed_write_leaves_listing_untouched(db):
+    author = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    book = create_book(db, new_book("Foundation", [author.id]))
+
+    with pytest.raises(Exception):
+        update_book(db, book.id, BookUpdate(title="Foundation", genre_id=99, publisher_id=1))
+    db.rollback()
+
+    assert [row.title for row in get_books(db)] == ["Foundation"]
+    assert listing.check(db)["consistent"]
+
+
+def test_listing_reads_one_table(db, engine):
+    author = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    for title in ["B", "A", "C"]:
+        create_book(db, new_book(title, [author.id]))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        books = get_books(db, genre_id=1, sort_by="title")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert [book.title for book in books] == ["A", "B", "C"]
+    assert len(statements) == 1
+    assert "JOIN" not in statements[0]
+
+
+def test_check_finds_and_rebuild_fixes_drift(db):
+    author = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    first = create_book(db, new_book("Foundation", [author.id]))
+    second = create_book(db, new_book("I, Robot", [author.id]))
+
+    # Changes made around services.py.
+    db.execute(text("UPDATE books SET title = 'Foundation!' WHERE id = :id"), {"id": first.id})
+    db.add(Book(title="Nightfall", genre_id=1, publisher_id=1))
+    db.query(BookListing).filter(BookListing.id == second.id).update({"id": 999})
+    db.commit()
+
+    report = listing.check(db)
+    assert not report["consistent"]
+    assert report["stale"] == [first.id]
+    assert report["missing"] == [second.id, second.id + 1]
+    assert report["orphaned"] == [999]
+
+    assert listing.rebuild(db) == 3
+    assert listing.check(db)["consistent"]
+    assert listing.ensure(db) is False
@@ -0,0 +1,87 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from app.maintenance import InFlightMiddleware, MaintenanceScheduler, enable_incremental_vacuum
+
+
+def fill_and_delete(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.executemany("INSERT INTO books (title) VALUES (?)", [("x" * 1000,)] * 500)
+    conn.commit()
+    conn.execute("DELETE FROM books")
+    conn.commit()
+    conn.close()
+
+
+def task(result, name):
+    return next(t for t in result["tasks"] if t["name"] == name)
+
+
+def test_incremental_vacuum_reclaims_free_pages(tmp_path):
+    path = str(tmp_path / "books.db")
+    enable_incremental_vacuum(create_engine(f"sqlite:///{path}"))
+    fill_and_delete(path)
+
+    (result,) = MaintenanceScheduler([path], budget_ms=5000).run()
+
+    assert result["reclaimed_pages"] > 0
+    assert task(result, "incremental_vacuum")["free_pages_left"] == 0
+    assert "error" not in task(result, "optimize")
+    assert task(result, "wal_checkpoint")["skipped"] == "not in WAL mode"
+
+
+def test_existing_databases_keep_their_vacuum_mode(tmp_path):
+    path = str(tmp_path / "books.db")
+    fill_and_delete(path)
+    enable_incremental_vacuum(create_engine(f"sqlite:///{path}"))
+
+    (result,) = MaintenanceScheduler([path]).run()
+
+    assert task(result, "incremental_vacuum")["skipped"] == "auto_vacuum is not INCREMENTAL"
+    assert result["reclaimed_pages"] == 0
+
+
+def test_wal_checkpoint_truncates_log(tmp_path):
+    path = str(tmp_path / "books.db")
+    # Writes through a connection that stays open, so closing it does not
+    # checkpoint and remove the log before the scheduler gets to it.
+    writer = sqlite3.connect(path)
+    writer.execute("PRAGMA journal_mode=WAL")
+    writer.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT)")
+    writer.executemany("INSERT INTO books (title) VALUES (?)", [("x" * 1000,)] * 100)
+    writer.commit()
+    wal = tmp_path / "books.db-wal"
+    assert wal.stat().st_size > 0
+
+    scheduler = MaintenanceScheduler([path], budget_ms=5000)
+    (result,) = scheduler.run()
+
+    assert wal.stat().st_size == 0
+    writer.close()
+
+    assert task(result, "wal_checkpoint")["busy"] is False
+    assert scheduler.status()["history"][0] is result
+
+
+def test_zero_budget_skips_tasks(tmp_path):
+    path = str(tmp_path / "books.db")
+    fill_and_delete(path)
+    (result,) = MaintenanceScheduler([path], budget_ms=0).run()
+    assert all(t.get("skipped") == "time budget spent" for t in result["tasks"])
+
+
+def test_idle_check_counts_requests_without_admission_control():
+    scheduler = MaintenanceScheduler([], max_in_flight=0)
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["quiet"] = scheduler.is_quiet()
+
+    scope = {"type": "http", "method": "GET", "path": "/books", "headers": []}
+    asyncio.run(InFlightMiddleware(app)(scope, None, None))
+
+    assert seen["quiet"] is False
+    assert scheduler.is_quiet()
@@ -0,0 +1,133 @@
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Genre, Publisher
+from app.related import RelatedIndex, related_index
+from app.schemas import AuthorCreate, BookCreate, BookUpdate
+from app.services import create_author, create_book, delete_book, get_related_books, update_book
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    related_index.reset()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield db
+    db.close()
+    related_index.reset()
+
+
+def test_index_ranks_shared_authors_then_genre_then_publisher():
+    index = RelatedIndex()
+    index.upsert(1, genre_id=1, publisher_id=1, published=date(1950, 1, 1), author_ids=[1])
+    index.upsert(2, genre_id=2, publisher_id=2, published=date(1950, 1, 1), author_ids=[1])
+    index.upsert(3, genre_id=1, publisher_id=2, published=date(1950, 1, 1), author_ids=[2])
+    index.upsert(4, genre_id=2, publisher_id=1, published=date(1950, 1, 1), author_ids=[3])
+    index.upsert(5, genre_id=2, publisher_id=2, published=None, author_ids=[])
+
+    assert index.related(1, limit=10) == [2, 3, 4, 5]
+    assert index.related(1, limit=2) == [2, 3]
+    assert index.related(99) is None
+
+
+def test_index_updates_and_removals():
+    index = RelatedIndex(capacity=1)
+    index.upsert(1, 1, 1, None, [1])
+    index.upsert(2, 2, 2, None, [1])
+    index.upsert(3, 2, 2, None, [2])
+    assert index.related(1) == [2, 3]
+
+    index.upsert(2, 2, 2, None, [2])
+    index.upsert(3, 1, 1, None, [1])
+    assert index.related(1) == [3, 2]
+
+    index.remove(3)
+    assert index.related(1) == [2]
+    assert index.related(3) is None
+
+
+def test_changes_committed_during_a_build_are_kept():
+    index = RelatedIndex()
+
+    def read():
+        # Commits landing after the build read the catalog.
+        index.apply({2: (1, 1, None, [1]), 1: None})
+        return [(1, 1, 1, None, [1]), (3, 2, 2, None, [])]
+
+    index.ensure_loaded(read)
+    assert index.related(3) == [2]
+    assert index.related(1) is None
+
+
+def test_concurrent_first_requests_build_once():
+    index = RelatedIndex()
+    reads = []
+    started = threading.Event()
+
+    def read():
+        reads.append(1)
+        started.wait(0.1)
+        return [(1, 1, 1, None, [1]), (2, 1, 1, None, [1])]
+
+    threads = [threading.Thread(target=index.ensure_loaded, args=(read,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    assert len(reads) == 1
+    assert index.related(1) == [2]
+
+
+def test_related_books_follow_committed_writes(db):
+    genre = Genre(name="Science Fiction")
+    other_genre = Genre(name="Fantasy")
+    publisher = Publisher(name="Tor Books")
+    db.add_all([genre, other_genre, publisher])
+    db.commit()
+    asimov = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    tolkien = create_author(db, AuthorCreate(name="J.R.R.", surname="Tolkien", birth_year=1892))
+
+    def book(title, genre_id, author):
+        return create_book(
+            db,
+            BookCreate(
+                title=title,
+                publisher_id=publisher.id,
+                genre_id=genre_id,
+                author_ids=[author.id],
+            ),
+        )
+
+    foundation = book("Foundation", genre.id, asimov)
+    robot = book("I, Robot", genre.id, asimov)
+    hobbit = book("The Hobbit", other_genre.id, tolkien)
+
+    titles = [b.title for b in get_related_books(db, foundation.id)]
+    assert titles == ["I, Robot", "The Hobbit"]
+
+    update_book(
+        db,
+        hobbit.id,
+        BookUpdate(
+            title="The Hobbit",
+            publisher_id=publisher.id,
+            genre_id=genre.id,
+            author_ids=[asimov.id],
+        ),
+    )
+    delete_book(db, robot.id)
+    assert [b.title for b in get_related_books(db, foundation.id)] == ["The Hobbit"]
+    assert get_related_books(db, 999) is None
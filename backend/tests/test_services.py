@@ -1,6 +1,6 @@
 import pytest
 from fastapi import HTTPException
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from app.database import Base
@@ -15,6 +15,7 @@ from app.services import (
     get_authors,
     get_book,
     get_books,
+    get_bootstrap,
     get_genre,
     get_genres,
     get_publisher,
@@ -169,3 +170,51 @@ def test_delete_book(db, sample_genre, sample_publisher):
     
     result = delete_book(db, book.id)
     assert result is True
+
+
+def test_get_books_sort_and_filters_do_not_share_cached_sql(db, sample_genre, sample_publisher):
+    author = create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    for title, edition in [("B", "3rd"), ("A", "2nd"), ("C", "1st")]:
+        create_book(db, BookCreate(
+            title=title, edition=edition,
+            publisher_id=sample_publisher.id, genre_id=sample_genre.id,
+            author_ids=[author.id]
+        ))
+
+    assert [b.title for b in get_books(db, sort_by="title")] == ["A", "B", "C"]
+    assert [b.title for b in get_books(db, sort_by="edition")] == ["C", "A", "B"]
+    assert [b.title for b in get_books(db, sort_by="title", order="desc")] == ["C", "B", "A"]
+    assert get_books(db, genre_id=sample_genre.id + 1) == []
+    assert len(get_books(db, author_id=author.id, limit=2)) == 2
+
+
+def test_create_book_with_unknown_author_fails(db, sample_genre, sample_publisher):
+    book_data = BookCreate(
+        title="Foundation", publisher_id=sample_publisher.id,
+        genre_id=sample_genre.id, author_ids=[999]
+    )
+    with pytest.raises(HTTPException) as exc:
+        create_book(db, book_data)
+    assert exc.value.status_code == 400
+
+
+def test_bootstrap_reads_in_one_transaction(db, sample_genre, sample_publisher):
+    create_author(db, AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append((id(conn.connection.dbapi_connection), statement.split()[0]))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        bootstrap = get_bootstrap(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert [verb for _, verb in statements] == ["BEGIN"] + ["SELECT"] * 4
+    assert len({conn for conn, _ in statements}) == 1
+    assert [a.surname for a in bootstrap["authors"]] == ["Asimov"]
+    assert bootstrap["genres"][0].name == sample_genre.name
+
+    # The read transaction is over, so writers are not blocked.
+    create_author(db, AuthorCreate(name="Ursula", surname="Le Guin", birth_year=1929))
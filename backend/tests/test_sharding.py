@@ -0,0 +1,135 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Author, Book, Genre, Publisher
+from app.related import related_index
+from app.schemas import AuthorCreate, AuthorUpdate, BookCreate, BookUpdate
+from app.sharding import ShardRouter
+
+
+def make_router(shards, shard_key="id"):
+    return ShardRouter(shards.engines, shards.session_factories, shard_key)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'shard_{i}.db'}") for i in range(3)]
+    session_factories = [
+        sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in engines
+    ]
+    related_index.reset()
+    router = ShardRouter(engines, session_factories)
+    router.init()
+
+    with router.session(0) as db:
+        db.add_all(
+            [
+                Genre(name="Science Fiction"),
+                Publisher(name="Penguin"),
+                Publisher(name="Tor Books"),
+            ]
+        )
+        db.commit()
+    router.sync_reference()
+    yield router
+    related_index.reset()
+    for engine in engines:
+        engine.dispose()
+
+
+def book_counts(router):
+    return router._each(lambda db: db.execute(select(func.count(Book.id))).scalar())
+
+
+def new_book(title, author_ids, publisher_id=1, published_date=None):
+    return BookCreate(
+        title=title,
+        publisher_id=publisher_id,
+        genre_id=1,
+        published_date=published_date,
+        author_ids=author_ids,
+    )
+
+
+def test_reference_data_is_replicated(shards):
+    author = shards.create_author(AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    names = shards._each(lambda db: [p.name for p in db.query(Publisher).order_by(Publisher.id)])
+    assert names == [["Penguin", "Tor Books"]] * 3
+    assert shards._each(lambda db: db.get(Author, author["id"]).surname) == ["Asimov"] * 3
+
+    shards.update_author(author["id"], AuthorUpdate(name="Isaac", surname="Asimov", birth_year=1919))
+    assert shards._each(lambda db: db.get(Author, author["id"]).birth_year) == [1919] * 3
+
+
+def test_books_are_spread_and_merged_in_sort_order(shards):
+    author = shards.create_author(AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    titles = ["Foundation", "I, Robot", "The Caves of Steel", "Nemesis", "Nightfall", "Pebble"]
+    created = [
+        shards.create_book(new_book(title, [author["id"]], published_date=date(1950 + i, 1, 1)))
+        for i, title in enumerate(titles)
+    ]
+
+    assert book_counts(shards) == [2, 2, 2]
+    assert [book.id for book in created] == [1, 2, 3, 4, 5, 6]
+    assert shards.get_book(created[2].id).title == "The Caves of Steel"
+
+    page = shards.get_books(skip=1, limit=3, sort_by="title")
+    assert [book.title for book in page] == sorted(titles)[1:4]
+    newest = shards.get_books(limit=2, sort_by="published_date", order="desc")
+    assert [book.title for book in newest] == ["Pebble", "Nightfall"]
+    assert len(shards.get_author(author["id"])["books"]) == 6
+    bootstrap = shards.get_bootstrap(limit=3)
+    assert [book.id for book in bootstrap["books"]] == [1, 2, 3]
+    assert [p.name for p in bootstrap["publishers"]] == ["Penguin", "Tor Books"]
+
+    with pytest.raises(HTTPException):
+        shards.delete_author(author["id"])
+
+
+def test_natural_key_is_unique_across_shards(shards):
+    first = shards.create_book(new_book("Foundation", []))
+    with pytest.raises(HTTPException) as exc:
+        shards.create_book(new_book("Foundation", []))
+    assert exc.value.status_code == 409
+    assert sum(book_counts(shards)) == 1
+
+    second = shards.create_book(new_book("I, Robot", []))
+    assert shards.shard_for(first.id, 1) != shards.shard_for(second.id, 1)
+    with pytest.raises(HTTPException) as exc:
+        shards.update_book(second.id, BookUpdate(title="Foundation", publisher_id=1, genre_id=1))
+    assert exc.value.status_code == 409
+    assert shards.update_book(first.id, BookUpdate(title="Foundation", publisher_id=1, genre_id=1))
+
+
+def test_changing_publisher_moves_book_under_publisher_key(shards):
+    router = make_router(shards, "publisher_id")
+    author = router.create_author(AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    book = router.create_book(new_book("Foundation", [author["id"]], publisher_id=1))
+    assert book_counts(router) == [0, 1, 0]
+
+    moved = router.update_book(
+        book.id, BookUpdate(title="Foundation", publisher_id=2, genre_id=1)
+    )
+    assert book_counts(router) == [0, 0, 1]
+    assert moved.publisher.name == "Tor Books"
+    assert [a.surname for a in moved.authors] == ["Asimov"]
+    assert router.get_books(publisher_id=2)[0].id == book.id
+    assert router.delete_book(book.id) is True
+    assert router.get_book(book.id) is None
+
+
+def test_rebalance_moves_books_to_their_shard(shards):
+    author = shards.create_author(AuthorCreate(name="Isaac", surname="Asimov", birth_year=1920))
+    for i in range(6):
+        shards.create_book(new_book(f"Book {i}", [author["id"]], publisher_id=1 + i % 2))
+
+    router = make_router(shards, "publisher_id")
+    moved = router.rebalance(batch_size=1)
+
+    assert sum(moved.values()) == 4
+    assert book_counts(router) == [0, 3, 3]
+    assert len(router.get_author(author["id"])["books"]) == 6
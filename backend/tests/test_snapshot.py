@@ -0,0 +1,144 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.listing import rebuild
+from app.main import app
+from app.models import Author, Book, Genre, Publisher
+from app.related import RelatedIndex
+from app.schemas import AuthorSummary, BookSummary
+from app.services import get_authors, get_books
+from app.snapshot import Snapshot, build_snapshot, get_snapshot
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    scifi = Genre(name="Science Fiction")
+    fantasy = Genre(name="Fantasy", description="Dragons")
+    penguin = Publisher(name="Penguin", creation_date=date(1935, 7, 30))
+    tor = Publisher(name="Tor Books")
+    asimov = Author(name="Isaac", surname="Asimov", birth_year=1920)
+    tolkien = Author(name="J.R.R.", surname="Tolkien", birth_year=1892)
+    db.add_all(
+        [
+            Book(title="Foundation", edition="1st", published_date=date(1951, 6, 1),
+                 genre=scifi, publisher=penguin, authors=[asimov]),
+            Book(title="The Hobbit", published_date=date(1937, 9, 21),
+                 genre=fantasy, publisher=tor, authors=[tolkien]),
+            Book(title="I, Robot", edition="1st", published_date=date(1950, 12, 2),
+                 genre=scifi, publisher=tor, authors=[asimov]),
+            Book(title="Anthology", genre=scifi, publisher=penguin, authors=[asimov, tolkien]),
+        ]
+    )
+    db.commit()
+    rebuild(db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def snapshot(db, tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    build_snapshot(db, path)
+    snapshot = Snapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def dump(schema, items):
+    return [schema.model_validate(item).model_dump() for item in items]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"sort_by": "title"},
+        {"sort_by": "published_date", "order": "desc"},
+        {"genre_id": 1, "sort_by": "title", "skip": 1},
+        {"author_id": 1, "sort_by": "title", "order": "desc"},
+        {"author_id": 2, "publisher_id": 2},
+        {"limit": 2, "sort_by": "edition"},
+    ],
+)
+def test_books_match_database(db, snapshot, params):
+    expected = dump(BookSummary, get_books(db, **params))
+    assert dump(BookSummary, snapshot.get_books(**params)) == expected
+
+
+def test_authors_match_database(db, snapshot):
+    expected = dump(AuthorSummary, get_authors(db, sort_by="surname", order="desc"))
+    assert dump(AuthorSummary, snapshot.get_authors(sort_by="surname", order="desc")) == expected
+
+
+def test_point_lookups(db, snapshot):
+    anthology = db.query(Book).filter(Book.title == "Anthology").one()
+    tolkien = db.query(Author).filter(Author.surname == "Tolkien").one()
+    penguin = db.query(Publisher).filter(Publisher.name == "Penguin").one()
+
+    book = snapshot.get_book(anthology.id)
+    assert book["title"] == "Anthology"
+    assert book["edition"] is None
+    assert sorted(author["surname"] for author in book["authors"]) == ["Asimov", "Tolkien"]
+    titles = sorted(b["title"] for b in snapshot.get_author(tolkien.id)["books"])
+    assert titles == ["Anthology", "The Hobbit"]
+    assert snapshot.get_publisher(penguin.id)["creation_date"] == date(1935, 7, 30)
+    assert snapshot.get_book(99) is None
+
+
+def test_internal_columns_are_not_stored(db, snapshot):
+    assert not any("content_hash" in name for name in snapshot._sections)
+    book = snapshot.get_book(1)
+    assert "content_hash" not in book
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_snapshot_mode_serves_reads_and_disables_writes(snapshot):
+    app.dependency_overrides[get_snapshot] = lambda: snapshot
+    try:
+        client = TestClient(app)
+        response = client.get("/books", params={"sort_by": "title"})
+        assert [book["title"] for book in response.json()][:2] == ["Anthology", "Foundation"]
+        genres = {genre["name"] for genre in client.get("/genres").json()}
+        assert genres == {"Science Fiction", "Fantasy"}
+        response = client.post("/authors", json={"name": "A", "surname": "B", "birth_year": 1})
+        assert response.status_code == 405
+    finally:
+        del app.dependency_overrides[get_snapshot]
+
+
+def test_snapshot_mode_serves_related_books(db, snapshot):
+    foundation = db.query(Book).filter(Book.title == "Foundation").one()
+    index = RelatedIndex()
+    index.build(db)
+
+    app.dependency_overrides[get_snapshot] = lambda: snapshot
+    try:
+        client = TestClient(app)
+        response = client.get(f"/books/{foundation.id}/related")
+        assert response.status_code == 200
+        assert [book["id"] for book in response.json()] == index.related(foundation.id)
+        assert client.get(f"/books/{foundation.id}/related?limit=-1").json() == []
+        assert client.get("/books/99/related").status_code == 404
+    finally:
+        del app.dependency_overrides[get_snapshot]
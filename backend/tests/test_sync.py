@@ -0,0 +1,177 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import init_db, listing
+from app.database import Base
+from app.init_db import create_schema
+from app.models import Author, Book, Genre, Publisher
+from app.schemas import AuthorCreate, BookCreate, BookUpdate, CatalogSync
+from app.services import create_author, create_book, get_book, update_book
+from app.sync import sync_catalog
+
+ASIMOV = {"name": "Isaac", "surname": "Asimov", "birth_year": 1920}
+CLARKE = {"name": "Arthur", "surname": "Clarke", "birth_year": 1917}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add_all([Genre(name="Science Fiction"), Genre(name="Fantasy"), Publisher(name="Penguin")])
+    db.commit()
+    yield db
+    db.close()
+
+
+def feed(**changes):
+    books = [
+        {"title": "Foundation", "edition": "1st", "published_date": "1951-06-01",
+         "publisher_id": 1, "genre_id": 1, "authors": [ASIMOV]},
+        {"title": "I, Robot", "publisher_id": 1, "genre_id": 1, "authors": [ASIMOV]},
+    ]
+    books[0].update(changes)
+    return CatalogSync(authors=[CLARKE], books=books)
+
+
+def record_writes(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", record)
+
+
+def test_first_sync_creates_then_repeat_writes_nothing(db, engine):
+    result = sync_catalog(db, feed())
+    assert result == {
+        "authors": {"created": 2, "updated": 0, "unchanged": 0},
+        "books": {"created": 2, "updated": 0, "unchanged": 0},
+    }
+    foundation = db.query(Book).filter_by(title="Foundation").one()
+    assert [a.surname for a in foundation.authors] == ["Asimov"]
+    assert listing.check(db)["consistent"]
+
+    writes, stop = record_writes(engine)
+    try:
+        result = sync_catalog(db, feed())
+    finally:
+        stop()
+    assert result["books"] == {"created": 0, "updated": 0, "unchanged": 2}
+    assert result["authors"]["unchanged"] == 2
+    assert writes == []
+
+
+def test_changed_records_rewrite_row_and_links(db):
+    sync_catalog(db, feed())
+    result = sync_catalog(db, feed(published_date="1952-01-01", genre_id=2,
+                                   authors=[ASIMOV, CLARKE]))
+    assert result["books"] == {"created": 0, "updated": 1, "unchanged": 1}
+
+    db.expire_all()
+    foundation = db.query(Book).filter_by(title="Foundation").one()
+    assert foundation.published_date == date(1952, 1, 1)
+    assert sorted(a.surname for a in foundation.authors) == ["Asimov", "Clarke"]
+    assert listing.check(db)["consistent"]
+
+    sync_catalog(db, feed(authors=[CLARKE]))
+    db.expire_all()
+    assert [a.surname for a in get_book(db, foundation.id).authors] == ["Clarke"]
+
+
+def test_rows_written_through_the_api_match_sync_hashes(db):
+    author = create_author(db, AuthorCreate(**ASIMOV))
+    book = create_book(db, BookCreate(title="I, Robot", publisher_id=1, genre_id=1,
+                                      author_ids=[author.id]))
+    update_book(db, book.id, BookUpdate(title="I, Robot", publisher_id=1, genre_id=1))
+
+    result = sync_catalog(db, feed())
+    assert result["books"] == {"created": 1, "updated": 0, "unchanged": 1}
+    assert result["authors"] == {"created": 1, "updated": 0, "unchanged": 1}
+
+
+def test_natural_keys_are_unique(db):
+    create_author(db, AuthorCreate(**ASIMOV))
+    with pytest.raises(HTTPException) as exc:
+        create_author(db, AuthorCreate(**ASIMOV))
+    assert exc.value.status_code == 409
+
+    create_book(db, BookCreate(title="I, Robot", publisher_id=1, genre_id=1))
+    with pytest.raises(HTTPException) as exc:
+        create_book(db, BookCreate(title="I, Robot", edition="", publisher_id=1, genre_id=1))
+    assert exc.value.status_code == 409
+
+
+def test_unknown_references_are_rejected(db):
+    with pytest.raises(HTTPException) as exc:
+        sync_catalog(db, feed(genre_id=99))
+    assert exc.value.status_code == 400
+    assert db.query(Book).count() == 0
+
+
+def test_create_schema_upgrades_existing_tables(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE authors (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+            "surname VARCHAR(100) NOT NULL, birth_year INTEGER NOT NULL)"
+        ))
+    create_schema(old)
+
+    columns = {column["name"] for column in inspect(old).get_columns("authors")}
+    assert "content_hash" in columns
+    indexes = {index["name"] for index in inspect(old).get_indexes("authors")}
+    assert "uq_authors_natural_key" in indexes
+
+
+def test_first_sync_after_seeding_writes_nothing(tmp_path, monkeypatch):
+    seeded = create_engine(f"sqlite:///{tmp_path / 'seeded.db'}")
+    monkeypatch.setattr(init_db, "SessionLocal", sessionmaker(autoflush=False, bind=seeded))
+    create_schema(seeded)
+    init_db.seed_db()
+
+    with init_db.SessionLocal() as db:
+        payload = CatalogSync(
+            books=[
+                {
+                    "title": book.title,
+                    "edition": book.edition,
+                    "published_date": book.published_date,
+                    "publisher_id": book.publisher_id,
+                    "genre_id": book.genre_id,
+                    "authors": [
+                        {"name": a.name, "surname": a.surname, "birth_year": a.birth_year}
+                        for a in book.authors
+                    ],
+                }
+                for book in db.query(Book)
+            ]
+        )
+        result = sync_catalog(db, payload)
+    assert result["books"]["created"] == result["books"]["updated"] == 0
+    assert result["authors"]["updated"] == 0
+
+
+def test_create_schema_backfills_hashes(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    create_schema(old)
+    with old.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO authors (name, surname, birth_year) VALUES ('Isaac', 'Asimov', 1920)"
+        ))
+    create_schema(old)
+    with sessionmaker(bind=old)() as db:
+        assert db.query(Author).one().content_hash is not None
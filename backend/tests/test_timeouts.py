@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.timeouts import (
+    QueryBudget,
+    QueryBudgetMiddleware,
+    attach,
+    current_budget,
+    interrupted_handler,
+    query_stats,
+)
+
+engine = create_engine("sqlite://")
+attach(engine)
+
+# Counts to a hundred million: seconds of work unless interrupted.
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+def run_with(budget, statement=SLOW_QUERY):
+    token = current_budget.set(budget)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(statement).scalar()
+    finally:
+        current_budget.reset(token)
+
+
+def test_statement_over_budget_is_interrupted():
+    before = query_stats.stats()["timeouts"]
+    budget = QueryBudget(timeout_ms=50)
+    with pytest.raises(OperationalError, match="interrupted"):
+        run_with(budget)
+    assert budget.interrupted == "timeout"
+    assert query_stats.stats()["timeouts"] == before + 1
+
+    # The budget is per statement; short ones still run.
+    assert run_with(QueryBudget(timeout_ms=50), text("SELECT 1")) == 1
+
+
+def test_cancelled_budget_stops_statements():
+    budget = QueryBudget(timeout_ms=0)
+    budget.cancelled = True
+    with pytest.raises(OperationalError):
+        run_with(budget)
+    assert budget.interrupted == "cancelled"
+
+
+def make_app(route_timeouts_ms=None):
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, timeout_ms=5000, route_timeouts_ms=route_timeouts_ms)
+    app.add_exception_handler(OperationalError, interrupted_handler)
+
+    @app.get("/slow")
+    def slow():
+        return run_with(current_budget.get())
+
+    @app.get("/fast")
+    def fast():
+        return run_with(current_budget.get(), text("SELECT 1"))
+
+    return app
+
+
+def test_route_budget_returns_504():
+    client = TestClient(make_app({"GET /slow": 50}))
+    response = client.get("/slow")
+    assert response.status_code == 504
+    assert client.get("/fast").json() == 1
+
+
+def test_disconnect_cancels_request():
+    seen = {}
+
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.05)
+        seen["cancelled"] = current_budget.get().cancelled
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    before = query_stats.stats()["disconnected_requests"]
+    scope = {"type": "http", "method": "GET", "path": "/books", "headers": []}
+    asyncio.run(QueryBudgetMiddleware(app, timeout_ms=5000)(scope, receive, send))
+
+    assert seen["cancelled"] is True
+    assert query_stats.stats()["disconnected_requests"] == before + 1
@@ -40,9 +40,7 @@ function App() {
   >(null);
 
     useEffect(() => {
-    loadAuthors();
-    loadGenres();
-    loadPublishers();
+    loadBootstrap();
   }, []);
 
     useEffect(() => {
@@ -57,6 +55,23 @@ function App() {
     }
   }, [selectedBookId]);
 
+  const loadBootstrap = async () => {
+    setLoading(true);
+    try {
+      const data = await api.getBootstrap();
+      setAuthors(data.authors);
+      setGenres(data.genres);
+      setPublishers(data.publishers);
+      setError(null);
+    } catch (err) {
+      // Genres and publishers arrive with the authors now, so there is no
+      // partial result to fall back on: one failure is the same as the
+      // author list failing, which was always shown as an error.
+      setError(err instanceof Error ? err.message : "Failed to load catalog");
+    }
+    setLoading(false);
+  };
+
   const loadAuthors = async () => {
     setLoading(true);
     try {
@@ -95,24 +110,6 @@ function App() {
     }
   };
 
-  const loadGenres = async () => {
-    try {
-      const data = await api.getGenres();
-      setGenres(data);
-    } catch (err) {
-      console.error("Failed to load genres:", err);
-    }
-  };
-
-  const loadPublishers = async () => {
-    try {
-      const data = await api.getPublishers();
-      setPublishers(data);
-    } catch (err) {
-      console.error("Failed to load publishers:", err);
-    }
-  };
-
   const handleAddAuthor = () => {
     setEditingAuthor(null);
     setShowAuthorForm(true);
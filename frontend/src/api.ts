@@ -5,6 +5,7 @@ import type {
   BookCreate,
   BookDetail,
   BookSummary,
+  Bootstrap,
   Genre,
   Publisher,
 } from "./types";
@@ -14,6 +15,10 @@ const API_BASE_URL =
   "http://localhost:8000";
 
 class ApiClient {
+  async getBootstrap(): Promise<Bootstrap> {
+    return this.request<Bootstrap>("/bootstrap");
+  }
+
   private async request<T>(
     endpoint: string,
     options?: RequestInit
@@ -53,3 +53,10 @@ export interface BookDetail extends BookBase {
   publisher: Publisher;
   authors: Author[];
 }
+
+export interface Bootstrap {
+  genres: Genre[];
+  publishers: Publisher[];
+  authors: Author[];
+  books: BookSummary[];
+}